@@ -0,0 +1,97 @@
+"""
+Конкурентность execute_sql в одном event loop: синхронный путь (psycopg2, как раньше
+в async-эндпоинте) против асинхронного (psycopg 3 + AsyncConnectionPool).
+
+Нужен локальный PostgreSQL (переменные DB_HOST/DB_PORT/DB_NAME/DB_USER/DB_PASSWORD).
+Запуск:
+    python -m benchmarks.async_db_concurrency --sessions 10 100 300 --delay 0.2
+    DB_POOL_MAX=50 python -m benchmarks.async_db_concurrency --sessions 300
+
+Каждая "сессия" выполняет уникальный запрос SELECT <i>, pg_sleep(delay), поэтому
+кэш результатов не участвует. Параллельно в том же цикле тикает задача-пульс:
+ее максимальная задержка показывает, насколько запросы блокируют event loop
+(в FastAPI это время, когда воркер не отвечает никому).
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from src.async_db import close_async_pg_pool, get_async_pg_pool
+from src.db_pool import close_pg_pool, get_pg_pool
+from src.result_cache import query_cache
+from src.tools import execute_sql
+
+TICK = 0.01
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - t0 - TICK) * 1000)
+
+
+async def run_sessions(mode: str, sessions: int, delay: float, offset: int) -> dict:
+    latencies, errors, lags = [], 0, []
+    stop = asyncio.Event()
+    pulse = asyncio.create_task(heartbeat(stop, lags))
+
+    async def one(i: int):
+        nonlocal errors
+        query = f"SELECT {offset + i} AS n, pg_sleep({delay})"
+        t0 = time.perf_counter()
+        if mode == "async":
+            result = await execute_sql.ainvoke({"query": query})
+        else:
+            # Так работал старый chat_endpoint: синхронный вызов прямо в корутине
+            result = execute_sql.invoke({"query": query})
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if result.startswith("Ошибка"):
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await pulse
+    return {
+        "rps": sessions / elapsed,
+        "elapsed": elapsed,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "max_loop_lag": max(lags, default=0.0),
+        "errors": errors,
+    }
+
+
+async def main_async(args):
+    # Пулы открываем заранее, чтобы не мерить установку соединений
+    get_pg_pool()
+    await get_async_pg_pool()
+    offset = 0
+    try:
+        for sessions in args.sessions:
+            for mode in args.modes:
+                query_cache.clear()
+                r = await run_sessions(mode, sessions, args.delay, offset)
+                offset += sessions
+                print(f"N={sessions:<4} {mode:<5}: {r['rps']:7.1f} req/s, {r['elapsed']:6.2f}s, "
+                      f"p50={r['p50']:7.1f}ms p95={r['p95']:7.1f}ms, "
+                      f"max loop lag={r['max_loop_lag']:7.1f}ms, errors={r['errors']}")
+    finally:
+        await close_async_pg_pool()
+        close_pg_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--delay", type=float, default=0.2, help="pg_sleep каждого запроса, секунды")
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
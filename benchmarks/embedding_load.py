@@ -0,0 +1,66 @@
+"""
+Нагрузочный бенчмарк эмбеддингов запросов: N одновременных "поисков" с микробатчингом
+(src/embedding_batcher.py) и без него.
+
+Запуск:
+    python -m benchmarks.embedding_load --concurrency 1 8 32 --requests 256
+
+Каждый запрос — уникальный текст, поэтому кэш эмбеддингов не участвует.
+Выводит пропускную способность (запросов/с), p50/p95 задержки и средний размер батча.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from src.embedding_batcher import BatchingEmbeddings
+from src.vector_store import EMBEDDING_MODEL
+
+
+def run_load(embeddings, concurrency: int, total: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def one(i: int):
+        t0 = time.perf_counter()
+        embeddings.embed_query(f"Сколько дней отпуска положено сотруднику номер {i}?")
+        with lock:
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": total / elapsed,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    model.embed_query("warmup")
+
+    for concurrency in args.concurrency:
+        direct = run_load(model, concurrency, args.requests)
+        batcher = BatchingEmbeddings(model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+        batched = run_load(batcher, concurrency, args.requests)
+        info = batcher.batch_info()
+        print(f"N={concurrency:<4} direct: {direct['rps']:7.1f} req/s p50={direct['p50']:6.1f}ms p95={direct['p95']:6.1f}ms | "
+              f"batched: {batched['rps']:7.1f} req/s p50={batched['p50']:6.1f}ms p95={batched['p95']:6.1f}ms "
+              f"avg_batch={info['avg_batch']}")
+
+
+if __name__ == "__main__":
+    main()
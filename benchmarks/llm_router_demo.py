@@ -0,0 +1,108 @@
+"""
+Маршрутизатор LLM против одной модели — офлайн, на локальном stub-сервере
+(benchmarks/stub_openai_server.py), без ключей и сети.
+
+Запуск:
+    python -m benchmarks.llm_router_demo --requests 200 --concurrency 16
+    python -m benchmarks.llm_router_demo --stream   # время до первого токена через astream
+
+Профиль по умолчанию: основная модель быстрая, но с тяжелым хвостом (--tail-prob)
+и долей 429 (--error-rate); запасная чуть медленнее и стабильна.
+Сравниваются три конфигурации:
+    single  — только основная модель (как раньше, один ChatOpenAI без повторов);
+    failover — роутер без хеджа: при 429/5xx запрос уходит на запасную модель;
+    hedged  — роутер с хеджем по перцентилю задержки и failover.
+Выводит p50/p95/p99 задержки, число ошибок и статистику роутера.
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.stub_openai_server import StubState, start_stub_server
+from src.llm_router import LLMRouter
+
+
+def client(base_url: str, model: str) -> ChatOpenAI:
+    return ChatOpenAI(model=model, base_url=base_url, api_key="stub", max_retries=0, timeout=30)
+
+
+async def run_load(model, total: int, concurrency: int, stream: bool) -> dict:
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        messages = [HumanMessage(content=f"Сколько сотрудников в отделе {i}?")]
+        async with semaphore:
+            t0, first_token = time.perf_counter(), None
+            try:
+                if stream:
+                    async for _ in model.astream(messages):
+                        # Меряем время до первого токена, но стрим дочитываем до конца
+                        first_token = first_token or time.perf_counter()
+                else:
+                    await model.ainvoke(messages)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(((first_token or time.perf_counter()) - t0) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    if not latencies:
+        return {"p50": float("nan"), "p95": float("nan"), "p99": float("nan"), "errors": errors}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50": p50, "p95": p95, "p99": p99, "errors": errors}
+
+
+async def compare(configs: dict, args):
+    # Один event loop на все конфигурации: HTTP-клиенты ChatOpenAI привязаны к циклу
+    for name, model in configs.items():
+        # Короткий прогрев: роутер набирает статистику для порога хеджа
+        await run_load(model, 20, args.concurrency, args.stream)
+        result = await run_load(model, args.requests, args.concurrency, args.stream)
+        print(f"{name:<9} p50={result['p50']:7.1f}ms p95={result['p95']:7.1f}ms p99={result['p99']:7.1f}ms "
+              f"errors={result['errors']}")
+        if isinstance(model, LLMRouter):
+            for model_id, info in model.router_info()["models"].items():
+                print(f"          {model_id}: {info}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=200, help="задержка основной модели, мс")
+    parser.add_argument("--backup-latency", type=float, default=300, help="задержка запасной модели, мс")
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--tail-mult", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.1, help="доля 429 у основной модели")
+    parser.add_argument("--percentile", type=float, default=90)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    state = StubState({
+        "primary": {"latency_ms": args.latency, "jitter_ms": args.latency / 4, "error_rate": args.error_rate, "status": 429},
+        "backup": {"latency_ms": args.backup_latency, "jitter_ms": args.backup_latency / 4, "error_rate": 0.0, "status": 503},
+    }, tail_prob=args.tail_prob, tail_mult=args.tail_mult, seed=42)
+    server, base_url = start_stub_server(state)
+    print(f"Stub OpenAI API: {base_url}; {args.requests} запросов, {args.concurrency} одновременно"
+          f"{', метрика — время до первого токена' if args.stream else ''}")
+
+    configs = {
+        "single": client(base_url, "primary"),
+        "failover": LLMRouter(role="demo", candidates=[client(base_url, "primary"), client(base_url, "backup")],
+                              hedge=False),
+        "hedged": LLMRouter(role="demo", candidates=[client(base_url, "primary"), client(base_url, "backup")],
+                            hedge_percentile=args.percentile),
+    }
+    asyncio.run(compare(configs, args))
+    print(f"stub: {state.counters}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
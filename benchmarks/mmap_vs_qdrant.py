@@ -0,0 +1,161 @@
+"""
+Сравнение памяти и задержки: mmap-индекс (src/mmap_store.py) против локального режима Qdrant.
+
+Запуск:
+    python -m benchmarks.mmap_vs_qdrant --n 1000000 --dtype int8
+    python -m benchmarks.mmap_vs_qdrant --n 1000000 --skip-qdrant   # только mmap
+
+Сначала оба хранилища заполняются одинаковыми синтетическими векторами, затем
+каждое открывается в отдельном процессе, чтобы честно измерить время старта,
+RSS процесса и задержку поиска. Recall@k считается относительно точного
+перебора в float32.
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+DIM = 384
+CHUNK = 50_000
+COLLECTION = "bench_docs"
+
+
+def chunk_vectors(index: int, size: int) -> np.ndarray:
+    # Каждый блок воспроизводим по своему seed — не нужно держать 1M векторов в памяти
+    rng = np.random.default_rng(index)
+    vectors = rng.standard_normal((size, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def iter_chunks(n: int):
+    for i, start in enumerate(range(0, n, CHUNK)):
+        yield start, chunk_vectors(i, min(CHUNK, n - start))
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_mmap(path: str, n: int, dtype: str):
+    from src.mmap_store import MmapVectorIndex
+    shutil.rmtree(path, ignore_errors=True)
+    index = MmapVectorIndex(path, dim=DIM, dtype=dtype)
+    for start, vectors in iter_chunks(n):
+        ids = list(range(start, start + len(vectors)))
+        index.upsert(ids, vectors, [{"text": f"doc {i}"} for i in ids])
+
+
+def build_qdrant(path: str, n: int):
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import VectorParams, Distance, PointStruct
+    shutil.rmtree(path, ignore_errors=True)
+    client = QdrantClient(path=path)
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+    for start, vectors in iter_chunks(n):
+        for offset in range(0, len(vectors), 1000):
+            part = vectors[offset:offset + 1000]
+            client.upsert(COLLECTION, points=[
+                PointStruct(id=start + offset + i, vector=v.tolist(), payload={"text": f"doc {start + offset + i}"})
+                for i, v in enumerate(part)
+            ])
+    client.close()
+
+
+def worker(backend: str, path: str, queries: np.ndarray, k: int) -> dict:
+    """Выполняется в отдельном процессе: открытие хранилища и серия запросов."""
+    base_rss = rss_mb()
+    t0 = time.perf_counter()
+    if backend == "mmap":
+        from src.mmap_store import MmapVectorIndex
+        index = MmapVectorIndex(path)
+        search = lambda q: [point_id for point_id, _, _ in index.search(q, k, score_threshold=-1.0)]
+    else:
+        from qdrant_client import QdrantClient
+        client = QdrantClient(path=path)
+        search = lambda q: [p.id for p in client.query_points(COLLECTION, query=q.tolist(), limit=k).points]
+    open_seconds = time.perf_counter() - t0
+    open_rss = rss_mb()
+
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        found.append(search(q))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        "backend": backend,
+        "open_s": round(open_seconds, 2),
+        "rss_open_mb": round(open_rss - base_rss, 1),
+        "rss_after_queries_mb": round(rss_mb() - base_rss, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "found": found,
+    }
+
+
+def exact_top_k(queries: np.ndarray, n: int, k: int) -> list:
+    best = [[] for _ in queries]
+    for start, vectors in iter_chunks(n):
+        scores = vectors @ queries.T
+        for qi in range(len(queries)):
+            top = np.argpartition(-scores[:, qi], k - 1)[:k]
+            best[qi].extend((float(scores[i, qi]), start + int(i)) for i in top)
+            best[qi] = sorted(best[qi], reverse=True)[:k]
+    return [[doc_id for _, doc_id in row] for row in best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dtype", default="float16", choices=["float16", "int8"])
+    parser.add_argument("--mmap-path", default="./mmap_bench")
+    parser.add_argument("--qdrant-path", default="./qdrant_bench")
+    parser.add_argument("--skip-qdrant", action="store_true")
+    parser.add_argument("--skip-build", action="store_true", help="Использовать уже построенные индексы")
+    parser.add_argument("--worker", choices=["mmap", "qdrant"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    queries = chunk_vectors(10_000_000, args.queries)
+
+    if args.worker:
+        path = args.mmap_path if args.worker == "mmap" else args.qdrant_path
+        print(json.dumps(worker(args.worker, path, queries, args.k)))
+        return
+
+    backends = ["mmap"] + ([] if args.skip_qdrant else ["qdrant"])
+    if not args.skip_build:
+        for backend in backends:
+            t0 = time.perf_counter()
+            if backend == "mmap":
+                build_mmap(args.mmap_path, args.n, args.dtype)
+            else:
+                build_qdrant(args.qdrant_path, args.n)
+            print(f"Построение {backend}: {time.perf_counter() - t0:.1f}s")
+
+    truth = exact_top_k(queries, args.n, args.k)
+    for backend in backends:
+        cmd = [sys.executable, "-m", "benchmarks.mmap_vs_qdrant", "--worker", backend,
+               "--queries", str(args.queries), "--k", str(args.k),
+               "--mmap-path", args.mmap_path, "--qdrant-path", args.qdrant_path]
+        result = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.splitlines()[-1])
+        hits = sum(len(set(f) & set(t)) for f, t in zip(result.pop("found"), truth))
+        result["recall"] = round(hits / (len(truth) * args.k), 3)
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Локальный OpenAI-совместимый stub-сервер для офлайн-проверки маршрутизатора LLM
+(src/llm_router.py). Реализует POST /v1/chat/completions (обычный ответ и stream)
+и GET /v1/models; никаких внешних зависимостей, только стандартная библиотека.
+
+Поведение задается на модель:
+    --model имя:задержка_мс[:разброс_мс[:доля_ошибок[:код_ошибки]]]
+Пример:
+    python -m benchmarks.stub_openai_server --port 8090 \\
+        --model fast:200:50 --model flaky:300:100:0.3:429 --model slow:1500:1000 --tail-prob 0.05
+
+С вероятностью --tail-prob ответ задерживается в --tail-mult раз ("тяжелый хвост",
+ради которого и нужен хедж). С --retry-after N ответы 429 несут заголовок Retry-After.
+Клиент: ChatOpenAI(model="fast", base_url="http://127.0.0.1:8090/v1", api_key="stub").
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_model(spec: str) -> tuple:
+    name, *rest = spec.split(":")
+    values = [float(v) for v in rest]
+    latency, jitter, error_rate, status = (values + [300, 0, 0, 503][len(values):])[:4]
+    return name, {"latency_ms": latency, "jitter_ms": jitter, "error_rate": error_rate, "status": int(status)}
+
+
+class StubState:
+    def __init__(self, models: dict, default_latency_ms: float = 300, tail_prob: float = 0.0,
+                 tail_mult: float = 10.0, token_ms: float = 5.0, seed: int = None, retry_after: float = 0):
+        self.models = models
+        self.default = {"latency_ms": default_latency_ms, "jitter_ms": 0, "error_rate": 0, "status": 503}
+        self.tail_prob = tail_prob
+        self.tail_mult = tail_mult
+        self.token_ms = token_ms
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def plan(self, model: str) -> tuple:
+        """(задержка в секундах, код ошибки или None) для очередного запроса."""
+        profile = self.models.get(model, self.default)
+        with self._lock:
+            counters = self.counters.setdefault(model, {"requests": 0, "errors": 0, "tail": 0})
+            counters["requests"] += 1
+            delay = max(profile["latency_ms"] + self.random.uniform(-1, 1) * profile["jitter_ms"], 0)
+            if self.random.random() < self.tail_prob:
+                delay *= self.tail_mult
+                counters["tail"] += 1
+            error = profile["status"] if self.random.random() < profile["error_rate"] else None
+            if error:
+                counters["errors"] += 1
+                delay = min(delay, profile["latency_ms"]) / 4  # Ошибки обычно приходят быстро
+        return delay / 1000, error
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Клиент отменил запрос (проигравший хедж) — это норма
+
+        def _json(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._json(200, {"object": "list", "data": [{"id": name, "object": "model"} for name in state.models]})
+            else:
+                self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "not found"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = request.get("model", "stub")
+            delay, error = state.plan(model)
+            time.sleep(delay)
+            if error:
+                headers = {"Retry-After": f"{state.retry_after:g}"} if error == 429 and state.retry_after else None
+                self._json(error, {"error": {"message": f"stub error {error}", "type": "stub", "code": error}}, headers)
+                return
+
+            last = (request.get("messages") or [{}])[-1].get("content") or ""
+            text = f"Ответ {model}: {str(last)[:60]}"
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            if not request.get("stream"):
+                self._json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(str(request.get("messages"))) // 4,
+                              "completion_tokens": len(text) // 4, "total_tokens": 0},
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                delta = {"role": "assistant", "content": word} if i == 0 else {"content": " " + word}
+                self._chunk(completion_id, model, delta, None)
+                time.sleep(state.token_ms / 1000)
+            self._chunk(completion_id, model, {}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def _chunk(self, completion_id: str, model: str, delta: dict, finish_reason):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stub_server(state: StubState, host: str = "127.0.0.1", port: int = 0):
+    """Запускает сервер в фоновом потоке. Возвращает (server, base_url для ChatOpenAI)."""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--model", action="append", default=[], help="имя:задержка_мс[:разброс_мс[:доля_ошибок[:код]]]")
+    parser.add_argument("--default-latency", type=float, default=300)
+    parser.add_argument("--tail-prob", type=float, default=0.0)
+    parser.add_argument("--tail-mult", type=float, default=10.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--retry-after", type=float, default=0, help="значение Retry-After для 429, с (0 — без заголовка)")
+    args = parser.parse_args()
+
+    state = StubState(dict(parse_model(spec) for spec in args.model), args.default_latency,
+                      args.tail_prob, args.tail_mult, args.token_ms, retry_after=args.retry_after)
+    server, base_url = start_stub_server(state, args.host, args.port)
+    print(f"Stub OpenAI API: {base_url} (модели: {', '.join(state.models) or 'любые'})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
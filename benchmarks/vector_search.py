@@ -0,0 +1,109 @@
+"""
+Бенчмарк поиска по векторной базе: старый путь (scroll 100 точек + косинус в Python)
+против нативного поиска ближайших соседей в Qdrant (query_points).
+
+Запуск:
+    python -m benchmarks.vector_search --n 100000 --queries 200
+
+Работает в локальном режиме Qdrant (path=...), модель эмбеддингов не нужна —
+используются синтетические нормированные векторы размерности 384.
+Recall@k считается относительно точного перебора по всей коллекции в NumPy.
+"""
+import argparse
+import shutil
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import VectorParams, Distance, PointStruct, HnswConfigDiff, SearchParams
+
+DIM = 384
+COLLECTION = "bench_docs"
+
+
+def make_vectors(n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def load_collection(client: QdrantClient, vectors: np.ndarray, batch: int = 1000):
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE),
+        hnsw_config=HnswConfigDiff(m=16, ef_construct=100)
+    )
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        client.upsert(
+            collection_name=COLLECTION,
+            points=[PointStruct(id=start + i, vector=v.tolist(), payload={"text": f"doc {start + i}"})
+                    for i, v in enumerate(chunk)],
+            wait=True
+        )
+
+
+def old_search(client: QdrantClient, query: np.ndarray, k: int):
+    # Повторяет прежнюю реализацию VectorManager.search
+    points = client.scroll(collection_name=COLLECTION, limit=100, with_payload=True, with_vectors=True)[0]
+    vectors = np.array([p.vector for p in points], dtype=np.float32)
+    sims = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    top = np.argsort(sims)[-k:][::-1]
+    return [points[i].id for i in top]
+
+
+def new_search(client: QdrantClient, query: np.ndarray, k: int, ef: int):
+    response = client.query_points(
+        collection_name=COLLECTION,
+        query=query.tolist(),
+        limit=k,
+        search_params=SearchParams(hnsw_ef=ef),
+        with_payload=True,
+        with_vectors=False
+    )
+    return [p.id for p in response.points]
+
+
+def run(name, fn, queries, truth, k):
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        found = fn(q)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += len(set(found) & set(expected))
+    lat = np.array(latencies)
+    print(f"{name:<28} recall@{k}={hits / (len(queries) * k):.3f}  "
+          f"p50={np.percentile(lat, 50):.2f}ms  p95={np.percentile(lat, 95):.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000, help="Размер синтетической коллекции")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--ef", type=int, default=128)
+    parser.add_argument("--path", default="./qdrant_bench", help="Папка локального Qdrant (будет пересоздана)")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.path, ignore_errors=True)
+    client = QdrantClient(path=args.path)
+
+    print(f"Генерация {args.n} векторов и загрузка в {args.path}...")
+    vectors = make_vectors(args.n, seed=0)
+    t0 = time.perf_counter()
+    load_collection(client, vectors)
+    print(f"Загрузка: {time.perf_counter() - t0:.1f}s")
+
+    queries = make_vectors(args.queries, seed=1)
+    truth = [np.argsort(vectors @ q)[-args.k:][::-1].tolist() for q in queries]
+
+    run("scroll-100 + brute force", lambda q: old_search(client, q, args.k), queries, truth, args.k)
+    run(f"query_points (ef={args.ef})", lambda q: new_search(client, q, args.k, args.ef), queries, truth, args.k)
+
+    client.close()
+    shutil.rmtree(args.path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
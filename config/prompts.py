@@ -6,6 +6,10 @@ get_db_schema() -> str:
     Возвращает структуру таблиц базы данных (названия таблиц и колонок). 
     ОБЯЗАТЕЛЬНО вызывай его первым, если не знаешь структуру БД.
 
+get_relevant_schema(question: str) -> str:
+    Возвращает только таблицы, относящиеся к вопросу (колонки, комментарии, внешние ключи),
+    и связанные с ними таблицы. Для больших баз вызывай его вместо get_db_schema, передавая вопрос пользователя.
+
 user_confirmation(query: str) -> bool:
     Инструмент для подтверждения SQL-запроса пользователем. 
     Передавай в него текст SELECT-запроса. Вызывай его ТОЛЬКО ПОСЛЕ того, как покажешь запрос пользователю и получишь согласие.
@@ -14,9 +18,15 @@ search_company_knowledge(query: str) -> str:
     Ищет ответы в текстовых документах (политики, инструкции, правила). 
     Используй это, если вопрос касается ПРАВИЛ, ПРОЦЕДУР или ОБЩЕЙ ИНФОРМАЦИИ, которой нет в таблицах БД.
 
-execute_sql(query: str) -> list:
-    Выполняет SELECT-запрос к базе данных и возвращает результат в виде списка строк. 
+execute_sql(query: str) -> str:
+    Выполняет SELECT-запрос к базе данных и возвращает результат в формате CSV (заголовок + строки). 
     Используй этот инструмент только после подтверждения от пользователя.
+    Если строк много, возвращает часть строк, статистику по числовым колонкам (min/max/mean по всему результату),
+    номер страницы и handle.
+
+fetch_sql_page(handle: str, page: int) -> str:
+    Возвращает следующую страницу большого результата execute_sql по handle.
+    Запрашивай дополнительные страницы только если они действительно нужны для ответа.
 """
 
 sys_msg = SystemMessage(content=f"""
@@ -47,7 +57,7 @@ sys_msg = SystemMessage(content=f"""
    - Не спорьте с критикой, просто предоставьте исправленный, идеальный SQL.
 
 2. ДИНАМИЧЕСКОЕ ИЗУЧЕНИЕ:
-   - Если вы не знаете схему, вызовите `get_db_schema`. Берите названия колонок ТОЛЬКО оттуда.
+   - Если вы не знаете схему, вызовите `get_relevant_schema` с вопросом пользователя (или `get_db_schema` для полной схемы). Берите названия колонок ТОЛЬКО оттуда.
 
 3. ГЕНЕРАЦИЯ И ПОДТВЕРЖДЕНИЕ:
    - Сформулируйте точный SQL-запрос (только SELECT).
@@ -92,4 +102,11 @@ optimizer_sys_msg = f"""Ты — узкоспециализированный SQ
 
 ### ТЕКУЩАЯ ЗАДАЧА:
 Проанализируй запрос и предложи улучшенную версию. Если правок нет, ответь 'OK'.
-"""
\ No newline at end of file
+"""
+# Резюме старой части диалога (скользящее окно истории, src/history.py)
+summary_sys_msg = """Ты ведешь краткое резюме диалога аналитика данных с пользователем.
+Тебе дают предыдущее резюме (может быть пустым) и следующую часть диалога.
+Обнови резюме: вопросы пользователя, итоговые SQL-запросы, ключевые цифры из ответов,
+выясненные таблицы/колонки и договоренности. Не пересказывай служебные сообщения.
+Пиши по-русски, сжато, не длиннее {max_tokens} токенов. Верни только текст резюме.
+"""
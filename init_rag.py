@@ -1,4 +1,4 @@
-from src.vector_store import vector_db
+from src.vector_store import get_vector_db
 
 docs = [
     "Сотрудники могут работать удаленно до 2-х дней в неделю по согласованию с руководителем.",
@@ -7,8 +7,10 @@ docs = [
     "Корпоративные обеды оплачиваются компанией на 50% в столовой на первом этаже."
 ]
 
+# Один батч эмбеддингов и один upsert вместо вызова add_doc на каждый документ.
+# Для загрузки целой папки документов используйте: python -m src.ingest <папка>
+get_vector_db().add_docs(docs)
 for doc in docs:
-    vector_db.add_doc(doc)
     print(f"Добавлено: {doc[:30]}...")
 
 print("✅ Векторная база знаний готова!")
\ No newline at end of file
@@ -1,15 +1,47 @@
 from src.agent import app, AgentState
 from langchain_core.messages import HumanMessage, AIMessage
-from src.llm_client import langfuse_handler
+from src.llm_client import langfuse_handler, llm, llm_inspector
+from src.llm_router import LLMRouter
 import uuid # Для генерации ID сессий
 
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from src.agent import app as langgraph_app
+from src import vector_store
+from src.db_pool import get_pg_pool, close_pg_pool
+from src.async_db import close_async_pg_pool, async_pool_stats
+from src.schema_cache import schema_cache
+from src.schema_index import schema_index
+from src.result_store import result_store
+from src.result_cache import query_cache
+from src.verdict_cache import verdict_cache
+from src.semantic_cache import semantic_cache
+from src.agent import checkpointer
+from src.checkpointer import start_pruning
+from src.streaming import stream_chat
 from langchain_core.messages import HumanMessage
+from contextlib import asynccontextmanager
+import os
+import threading
 import uuid
-app = FastAPI(title="RAG SQL Agent API")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогреваем RAG (загрузка модели эмбеддингов + Qdrant) в фоне при старте,
+    # чтобы холодный старт не ложился на первый запрос пользователя.
+    if os.getenv("RAG_WARMUP", "1") == "1":
+        threading.Thread(target=vector_store.warmup, name="rag-warmup", daemon=True).start()
+    # Периодически удаляем старые чекпоинты и неактивные треды (sqlite/postgres-бэкенд)
+    start_pruning(checkpointer)
+    yield
+    await close_async_pg_pool()
+    close_pg_pool()
+
+
+app = FastAPI(title="RAG SQL Agent API", lifespan=lifespan)
 
 
 # --- ЛОГИКА API (FastAPI) ---
@@ -29,11 +61,13 @@ async def chat_endpoint(payload: UserMessage):
         "run_name": "API_SQL_Agent"
     }
 
-    # ВАЖНО: Благодаря checkpointer в Postgres, мы передаем ТОЛЬКО новое сообщение.
+    # ВАЖНО: Благодаря checkpointer (SQLite/Postgres, см. src/checkpointer.py), мы передаем ТОЛЬКО новое сообщение.
     # Старые сообщения LangGraph сам подтянет из базы по thread_id.
     inputs = {"messages": [HumanMessage(content=payload.text)]}
     
-    final_state = langgraph_app.invoke(inputs, config=config)
+    # ainvoke: LLM и SQL (async-пул psycopg 3) ждут I/O, не блокируя event loop,
+    # поэтому один воркер uvicorn обслуживает много сессий одновременно
+    final_state = await langgraph_app.ainvoke(inputs, config=config)
     
     last_message = final_state["messages"][-1]
     return {
@@ -42,6 +76,63 @@ async def chat_endpoint(payload: UserMessage):
     }
 
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(payload: UserMessage):
+    """То же, что /chat, но ответ идет потоком (SSE): токены агента и события узлов графа
+    (вердикт инспекции, готовый SQL, строки результата) по мере их появления. См. src/streaming.py."""
+    thread_id = payload.session_id or str(uuid.uuid4())
+    config = {
+        "configurable": {"thread_id": thread_id},
+        "callbacks": [langfuse_handler],
+        "run_name": "API_SQL_Agent_Stream"
+    }
+    inputs = {"messages": [HumanMessage(content=payload.text)]}
+    return StreamingResponse(
+        stream_chat(langgraph_app, inputs, config),
+        media_type="text/event-stream",
+        # Прокси (nginx) не должны буферизовать поток, иначе пользователь снова ждет весь ответ
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "rag_ready": vector_store.is_ready()}
+
+
+@app.get("/stats")
+async def stats():
+    """Метрики инфраструктуры агента (пул соединений и т.д.)."""
+    return {
+        "db_pool": get_pg_pool().stats(),
+        "async_db_pool": async_pool_stats(),
+        "schema_cache": schema_cache.stats,
+        "schema_index": schema_index.info(),
+        "sql_cache": query_cache.cache_info(),
+        "verdict_cache": verdict_cache.cache_info(),
+        "semantic_cache": semantic_cache.cache_info(),
+        "llm_router": [model.router_info() for model in (llm, llm_inspector) if isinstance(model, LLMRouter)],
+    }
+
+
+@app.get("/results/{handle}")
+async def result_page(handle: str, page: int = 1):
+    """Постраничная выдача большого результата execute_sql (handle приходит в ответе инструмента)."""
+    result = result_store.page(handle, page)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Результат не найден или устарел")
+    return result
+
+
+@app.post("/cache/sql/invalidate")
+async def invalidate_sql_cache(table: str = None):
+    """Сбрасывает кэш результатов SQL: по таблице (после загрузки данных) или целиком."""
+    if table:
+        return {"invalidated": query_cache.invalidate_table(table)}
+    query_cache.clear()
+    return {"invalidated": "all"}
+
+
 # --- ЛОГИКА CLI (Для тестов в консоли) ---
 
 def run_cli():
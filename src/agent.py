@@ -1,13 +1,22 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Optional, Annotated, Sequence
 from langchain_core.messages import BaseMessage, ToolMessage, HumanMessage, AIMessage, SystemMessage
-from src.tools import tool_node, get_db_schema, execute_sql, user_confirmation, search_company_knowledge #наши инструменты
+from langchain_core.runnables import RunnableLambda
+from src.tools import tool_node, clean_sql, get_db_schema, get_relevant_schema, execute_sql, fetch_sql_page, user_confirmation, search_company_knowledge #наши инструменты
 from src.llm_client import llm, llm_inspector
+from src.sql_guard import inspect_query, format_plan_feedback
+from src.sql_validator import validate_sql
+from src.schema_cache import schema_cache
+from src.verdict_cache import verdict_cache, verdict_key
+from src.semantic_cache import semantic_cache, is_confirmation, contextual_question, SEMANTIC_CACHE_ENABLED
+from src.history import HistoryManager
 from langgraph.graph.message import add_messages
 from config.prompts import sys_msg, validator_sys_msg, optimizer_sys_msg # Промпты для LLM
 from config.few_shot_example import ASSISTANT_FEW_SHOT, VALIDATOR_FEW_SHOT, OPTIMIZER_FEW_SHOT  # ПримерыFew-Shot для LLM
 
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 
@@ -21,8 +30,19 @@ class AgentState(TypedDict):
     awaiting_confirmation: bool
     # Храним фидбек от наших функций поиска синтаксической ошибки/ оптимизации
     feedback: Optional[str] 
+    # Исходный вопрос пользователя (не "да"/"ок") — ключ семантического кэша SQL
+    question: Optional[str]
+    # Сколько мс LLM потратила на вывод SQL для этого вопроса (оценка выигрыша от кэша)
+    generation_ms: float
+    # Скользящее резюме старой части диалога и число сообщений, которые оно покрывает (src/history.py)
+    summary: Optional[str]
+    summarized_until: int
+    # Вердикт последнего узла проверки SQL (inspection / cost_gate):
+    # ok | advice (есть рекомендации оптимизатора) | rejected (запрос нужно переписать)
+    inspection_status: Optional[str]
 
-def assistant(state: AgentState) -> AgentState:
+def _prepare_assistant(state: AgentState):
+    """Шаги 1-4 до вызова модели: (модель с инструментами, сообщения для нее, подтвержден ли SQL)."""
 
     # 1. Инициализация состояний (State)
     # Используем .get() или setdefault, чтобы избежать ошибок при первом запуске
@@ -60,24 +80,30 @@ def assistant(state: AgentState) -> AgentState:
     if state.get("generated_sql") and not is_confirmed:
         current_sys_msg += f"\nТЕКУЩИЙ ПОДГОТОВЛЕННЫЙ SQL: {state['generated_sql']}. Если пользователь подтвердит, используй user_confirmation."
 
+    # Старые ходы диалога, свернутые в резюме, в промпт не попадают — только их краткое содержание
+    if state.get("summary"):
+        current_sys_msg += f"\n\n[КРАТКОЕ СОДЕРЖАНИЕ ПРЕДЫДУЩЕГО РАЗГОВОРА]: {state['summary']}"
+
     final_sys_msg = SystemMessage(content=current_sys_msg)
 
     # Настройка инструментов в зависимости от стадии
     if is_confirmed:
-        llm_with_tools = llm.bind_tools([get_db_schema, execute_sql, user_confirmation, search_company_knowledge])
+        llm_with_tools = llm.bind_tools([get_db_schema, get_relevant_schema, execute_sql, fetch_sql_page, user_confirmation, search_company_knowledge])
     elif state.get("generated_sql"):
         # Если SQL есть, агент может либо подтвердить его, либо переделать, если он ему не нравится
-        llm_with_tools = llm.bind_tools([search_company_knowledge, user_confirmation, execute_sql])
+        llm_with_tools = llm.bind_tools([search_company_knowledge, user_confirmation, execute_sql, fetch_sql_page])
     else:
         # Добавляем RAG для улучшения запросов
-        llm_with_tools = llm.bind_tools([get_db_schema, search_company_knowledge, user_confirmation])
+        llm_with_tools = llm.bind_tools([get_db_schema, get_relevant_schema, search_company_knowledge, user_confirmation])
 
     # 4. Вызов модели
     #upd (теперь список состоит только из объектов сообщений)
     # Нормализуем историю для Mistral/OpenRouter (чтобы не было двух Human подряд 
     # или ToolMessage сразу после HumanMessage)
+    # История ограничена бюджетом токенов: последние ходы как есть, вывод старых инструментов — заглушки
+    history = history_manager.build(messages, state.get("summary"), state.get("summarized_until", 0))
     normalized_messages = []
-    for msg in messages:
+    for msg in history:
         # Если в истории два сообщения от человека подряд — Mistral выдаст ошибку.
         # Мы оставляем только последнее (самое актуальное).
         if normalized_messages and normalized_messages[-1].type == msg.type == 'human':
@@ -89,8 +115,10 @@ def assistant(state: AgentState) -> AgentState:
     # некоторые провайдеры требуют, чтобы между ними был ответ от AI.
     # Но в LangGraph обычно достаточно просто передать список корректно:
 
-    ai_msg = llm_with_tools.invoke([final_sys_msg] + normalized_messages)
+    return llm_with_tools, [final_sys_msg] + normalized_messages, is_confirmed
+
 
+def _apply_ai_message(state: AgentState, ai_msg: AIMessage, is_confirmed: bool) -> AgentState:
     # 5. Обновление стейта на основе действий модели
     # Если модель вызвала подтверждение — фиксируем SQL и переходим в режим ожидания
     if ai_msg.tool_calls:
@@ -99,7 +127,7 @@ def assistant(state: AgentState) -> AgentState:
             if call['name'] == 'user_confirmation':
                 # ВАЖНО: Сейчас мы записываем "черновик" SQL. 
                 # Функция route() перехватит этот вызов и отправит его по цепочке:
-                # Validator (проверка) -> Optimizer (улучшение).
+                # Inspection (валидатор и оптимизатор параллельно) -> Cost gate.
                 # Финальный SQL в state["generated_sql"] попадет только после них.
                 state["generated_sql"] = call['args'].get('query')
                 # Включаем "предохранитель": пока цепочка LLM не закончит работу,
@@ -127,60 +155,315 @@ def assistant(state: AgentState) -> AgentState:
         "feedback": None
     }
 
-#добавим к основному агенту еще два узла для проверки синтаксиса SQL(validation) и его улучшения(optimization)
 
-# --- Узел Валидатора (Production) ---
-def sql_valiadator_node(state: AgentState) -> AgentState:
-    query = state.get("generated_sql")
-    if not query: return state
-    
-    # Мы используем заранее подготовленный validator_sys_msg из файла prompts.py
-    # Он уже содержит роль, Few-Shot примеры и инструкцию.   
-    response = llm_inspector.invoke([
-        SystemMessage(content=validator_sys_msg),
-        HumanMessage(content=f"Проверь этот SQL: {query}")
-    ])
+def _with_generation_time(update: dict, state: AgentState, is_confirmed: bool, started: float) -> dict:
+    # Время генерации копится, пока SQL еще не подтвержден (это и экономит семантический кэш)
+    if not is_confirmed:
+        update["generation_ms"] = state.get("generation_ms", 0.0) + (time.perf_counter() - started) * 1000
+    return update
+
+
+def _record_executed_sql(state: AgentState):
+    """Подтвержденный и успешно выполненный SQL сохраняется в семантический кэш под исходным вопросом."""
+    messages = state["messages"]
+    question = state.get("question")
+    last = messages[-1] if messages else None
+    if not (question and isinstance(last, ToolMessage) and last.name == "execute_sql"):
+        return
+    # CustomToolNode помечает исключения и таймауты status="error" ("Error in execute_sql: ...")
+    if last.status == "error" or str(last.content).startswith("Ошибка"):
+        return
+
+    query, confirmed = None, False
+    for msg in reversed(messages[:-1]):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, ToolMessage) and msg.name == "user_confirmation" and msg.content == "True":
+            confirmed = True
+        if isinstance(msg, AIMessage) and query is None:
+            for call in msg.tool_calls:
+                if call["id"] == last.tool_call_id:
+                    query = call["args"].get("query")
+    if not (query and confirmed):
+        return
+    try:
+        semantic_cache.store(question, clean_sql(query), schema_cache.fingerprint(), state.get("generation_ms", 0.0))
+    except Exception as e:
+        print(f"🧠 [SEMANTIC CACHE]: не удалось сохранить запрос: {e}")
+
+
+def _update_history(state: AgentState) -> dict:
+    try:
+        return history_manager.update(state)
+    except Exception as e:
+        # Без резюме промпт просто будет длиннее (заглушки и бюджет все равно применяются)
+        print(f"🗜️ [HISTORY]: не удалось обновить резюме: {e}")
+        return {}
+
+
+async def _aupdate_history(state: AgentState) -> dict:
+    try:
+        return await history_manager.aupdate(state)
+    except Exception as e:
+        print(f"🗜️ [HISTORY]: не удалось обновить резюме: {e}")
+        return {}
+
+
+def assistant(state: AgentState) -> AgentState:
+    _record_executed_sql(state)
+    history_update = _update_history(state)
+    state.update(history_update)
+    llm_with_tools, prompt, is_confirmed = _prepare_assistant(state)
+    started = time.perf_counter()
+    ai_msg = llm_with_tools.invoke(prompt)
+    update = _with_generation_time(_apply_ai_message(state, ai_msg, is_confirmed), state, is_confirmed, started)
+    return {**update, **history_update}
+
+
+async def aassistant(state: AgentState) -> AgentState:
+    """Асинхронный узел агента (app.ainvoke): ожидание LLM не блокирует event loop."""
+    # Эмбеддинг вопроса считается на CPU — выносим из event loop
+    await asyncio.to_thread(_record_executed_sql, state)
+    history_update = await _aupdate_history(state)
+    state.update(history_update)
+    llm_with_tools, prompt, is_confirmed = _prepare_assistant(state)
+    started = time.perf_counter()
+    ai_msg = await llm_with_tools.ainvoke(prompt)
+    update = _with_generation_time(_apply_ai_message(state, ai_msg, is_confirmed), state, is_confirmed, started)
+    return {**update, **history_update}
+
+
+# --- Узел семантического кэша (вход графа) ---
+def semantic_cache_node(state: AgentState) -> AgentState:
+    """Похожий вопрос уже решался: предлагаем готовый SQL без генерации (подтверждение все равно нужно)."""
+    last = state["messages"][-1]
+    if not SEMANTIC_CACHE_ENABLED or not isinstance(last, HumanMessage) or not isinstance(last.content, str):
+        return {}
+    # "Да"/"Ок" — ответ на предложенный SQL, а не новый вопрос
+    if is_confirmation(last.content):
+        return {}
+
+    # Уточнение ("а за 2023 год?") ищется вместе с предыдущим вопросом треда
+    question = contextual_question(last.content, state.get("question"))
+    update = {"question": question, "generation_ms": 0.0}
+    try:
+        hit = semantic_cache.lookup(question, schema_cache.fingerprint())
+    except Exception as e:
+        print(f"🧠 [SEMANTIC CACHE]: поиск недоступен: {e}")
+        return update
+    if hit is None:
+        return update
+
+    print(f"🧠 [SEMANTIC CACHE]: ✅ Похожий вопрос ({hit['similarity']:.2f}): {hit['question']}")
+    asked = hit["question"].replace("\n", " → ")  # Уточнение хранится вместе с исходным вопросом
+    reply = (f"Похожий вопрос уже задавали («{asked}»), и для него есть проверенный запрос:\n"
+             f"```sql\n{hit['sql']}\n```\nВыполнить его?")
+    return {
+        **update,
+        "messages": [AIMessage(content=reply)],
+        "generated_sql": hit["sql"],
+        "awaiting_confirmation": True,
+        "feedback": None,
+    }
+
+
+def route_semantic_cache(state: AgentState) -> str:
+    # Кэш ответил сам — ждем подтверждения пользователя, иначе вопрос уходит агенту
+    return END if isinstance(state["messages"][-1], AIMessage) else "agent"
+
+# Резюме старых ходов пишет та же модель, что ведет диалог
+history_manager = HistoryManager(llm)
+
+#добавим к основному агенту узел проверки SQL: синтаксис (validation) и улучшение (optimization)
+
+
+# Роль инспектора -> (системный промпт, префикс задания).
+# Мы используем заранее подготовленные validator_sys_msg/optimizer_sys_msg из файла prompts.py,
+# они уже содержат роль, Few-Shot примеры и инструкцию.
+INSPECTORS = {
+    "validator": (validator_sys_msg, "Проверь этот SQL: "),
+    "optimizer": (optimizer_sys_msg, "Оптимизируй этот SQL: "),
+}
+
+
+def _inspection_request(role: str, query: str, fingerprint: Optional[str]):
+    """Сообщения для инспектора и ключ кэша вердиктов (None — кэш не используется)."""
+    prompt, task = INSPECTORS[role]
+    messages = [SystemMessage(content=prompt), HumanMessage(content=f"{task}{query}")]
+    # Без отпечатка схемы нельзя гарантировать, что вердикт еще актуален
+    key = verdict_key(role, query, prompt, fingerprint) if fingerprint else None
+    return messages, key
+
+
+def _inspect(role: str, query: str, fingerprint: Optional[str]) -> str:
+    messages, key = _inspection_request(role, query, fingerprint)
+    cached = verdict_cache.get(key) if key else None
+    if cached is not None:
+        return cached
     #Убираем лишние пробелы и переносы (.strip())
-    verdict = response.content.strip()
+    verdict = llm_inspector.invoke(messages).content.strip()
+    if key:
+        verdict_cache.put(key, verdict)
+    return verdict
+
+
+async def _ainspect(role: str, query: str, fingerprint: Optional[str]) -> str:
+    messages, key = _inspection_request(role, query, fingerprint)
+    cached = verdict_cache.get(key) if key else None
+    if cached is not None:
+        return cached
+    verdict = (await llm_inspector.ainvoke(messages)).content.strip()
+    if key:
+        verdict_cache.put(key, verdict)
+    return verdict
 
+
+def _validator_feedback(verdict: str) -> Optional[str]:
     if "OK" not in verdict.upper():
         print(f"🛡️ [DEVSTRAL VALIDATOR]: Обнаружена проблема! {verdict}")
-        # Записываем критику в feedback, чтобы Ассистент её увидел
-        return {"feedback": f"Ошибка синтаксиса/безопасности: {verdict}"}
+        return f"Ошибка синтаксиса/безопасности: {verdict}"
     print(f"🛡️ [DEVSTRAL VALIDATOR]: ✅ SQL проверен, ошибок не обнаружено.")
-    return {"feedback": None} # Очищаем feedback, если всё хорошо
-
+    return None
 
-# --- Узел Оптимизатора (Production) ---
-def sql_opimizer_node(state: AgentState) -> AgentState:
-    query = state.get("generated_sql")
-    if not query: return state
-    
-    response = llm_inspector.invoke([
-        SystemMessage(content=optimizer_sys_msg),
-        HumanMessage(content=f"Оптимизируй этот SQL: {query}")
-    ])
 
-    verdict = response.content.strip()
-    
+def _optimizer_feedback(verdict: str) -> Optional[str]:
     if "OK" not in verdict.upper():
         print(f"🚀 [DEVSTRAL OPTIMIZER]: Дал рекомендацию. {verdict}")
-        return {"feedback": f"Рекомендация по логике: {verdict}"}
+        return f"Рекомендация по логике: {verdict}"
     print(f"🚀 [DEVSTRAL OPTIMIZER]: ✅ Запрос уже оптимален.")
-    return state
+    return None
+
+
+def _local_validation(query: str, schema: Optional[dict]) -> dict:
+    """Локальная проверка по AST и закэшированной схеме (микросекунды, без LLM)."""
+    try:
+        if schema is None:
+            raise RuntimeError("схема недоступна")
+        local = validate_sql(query, schema["tables"])
+    except Exception as e:
+        local = {"status": "unknown", "errors": [str(e)]}
+    if local["status"] == "error":
+        print(f"🛡️ [LOCAL VALIDATOR]: Обнаружена проблема! {'; '.join(local['errors'])}")
+    elif local["status"] == "ok":
+        print(f"🛡️ [LOCAL VALIDATOR]: ✅ SQL проверен, ошибок не обнаружено.")
+    return local
+
+
+def merge_feedback(validator: Optional[str], optimizer: Optional[str]) -> Optional[str]:
+    """Фиксированный порядок независимо от того, кто ответил первым:
+    сначала ошибки валидатора, затем рекомендации оптимизатора."""
+    return "\n".join(f for f in (validator, optimizer) if f) or None
+
+
+# --- Узел инспекции (Production) ---
+# Оптимизатор вызывается только для запроса, прошедшего валидацию; результат сводится в один feedback.
+# Синхронный вариант (invoke / CLI) вызывает оптимизатор после валидатора: запрос к LLM из потока
+# не прервать, и параллельный вызов для отклоненного запроса был бы оплачен впустую.
+# Асинхронный вариант запускает их параллельно и отменяет оптимизатор, если валидатор отклонил запрос.
+# Вердикты кэшируются (src/verdict_cache.py): одинаковый SQL из разных сессий не проверяется повторно.
+def sql_inspection_node(state: AgentState) -> AgentState:
+    query = state.get("generated_sql")
+    if not query: return state
+    # Markdown-ограждение (```sql) убирается так же, как в execute_sql: иначе локальный
+    # валидатор видит синтаксическую ошибку, а ключ кэша вердиктов зависит от оформления
+    query = clean_sql(query)
+
+    try:
+        schema = schema_cache.get()
+    except Exception:
+        schema = None
+    fingerprint = schema["fingerprint"] if schema else None
+
+    local = _local_validation(query, schema)
+    if local["status"] == "error":
+        return {"feedback": f"Ошибка синтаксиса/безопасности: {'; '.join(local['errors'])}",
+                "inspection_status": "rejected"}
+
+    validator_feedback = None
+    # В LLM-валидатор уходят только запросы, которые локально решить нельзя
+    if local["status"] == "unknown":
+        validator_feedback = _validator_feedback(_inspect("validator", query, fingerprint))
+        if validator_feedback:
+            return {"feedback": validator_feedback, "inspection_status": "rejected"}
+
+    optimizer_feedback = _optimizer_feedback(_inspect("optimizer", query, fingerprint))
+    return {"feedback": merge_feedback(validator_feedback, optimizer_feedback),
+            "inspection_status": "advice" if optimizer_feedback else "ok"}
+
+
+async def asql_inspection_node(state: AgentState) -> AgentState:
+    """Асинхронный вариант (app.ainvoke): оба вызова инспектора — задачи одного event loop."""
+    query = state.get("generated_sql")
+    if not query: return state
+    query = clean_sql(query)
+
+    try:
+        schema = await schema_cache.aget()
+    except Exception:
+        schema = None
+    fingerprint = schema["fingerprint"] if schema else None
+
+    local = _local_validation(query, schema)
+    if local["status"] == "error":
+        return {"feedback": f"Ошибка синтаксиса/безопасности: {'; '.join(local['errors'])}",
+                "inspection_status": "rejected"}
+
+    optimizer = asyncio.create_task(_ainspect("optimizer", query, fingerprint))
+    validator_feedback = None
+    try:
+        if local["status"] == "unknown":
+            validator_feedback = _validator_feedback(await _ainspect("validator", query, fingerprint))
+            if validator_feedback:
+                return {"feedback": validator_feedback, "inspection_status": "rejected"}
+        optimizer_feedback = _optimizer_feedback(await optimizer)
+        return {"feedback": merge_feedback(validator_feedback, optimizer_feedback),
+                "inspection_status": "advice" if optimizer_feedback else "ok"}
+    finally:
+        # Валидатор отклонил запрос (или упал) — HTTP-запрос оптимизатора прерывается
+        if not optimizer.done():
+            optimizer.cancel()
+
+
+# --- Узел проверки плана (EXPLAIN) ---
+def sql_cost_gate_node(state: AgentState) -> AgentState:
+    query = state.get("generated_sql")
+    if not query: return state
+    query = clean_sql(query)
+
+    # EXPLAIN не выполняет запрос: только оценки планировщика в read-only сессии
+    try:
+        summary, problems = inspect_query(query)
+    except Exception as e:
+        plan_feedback = f"EXPLAIN не удался, запрос не может быть выполнен: {e}"
+    else:
+        if not problems:
+            print(f"📊 [COST GATE]: ✅ План в пределах порогов (стоимость {summary['total_cost']:.0f}).")
+            return {"inspection_status": "ok"}
+        plan_feedback = format_plan_feedback(summary, problems)
+    print(f"📊 [COST GATE]: {plan_feedback}")
+
+    # Дополняем, а не затираем критику инспекции
+    previous = state.get("feedback")
+    return {"feedback": f"{previous}\n{plan_feedback}" if previous else plan_feedback,
+            "inspection_status": "rejected"}
     
 #графы
 # 1. Инициализация графа
 graph = StateGraph(AgentState)
 # 2. Добавляем узлы
-#UPD дообавляем узлы валидации и оптимизации SQL
-graph.add_node("validator", sql_valiadator_node)
-graph.add_node("optimizer", sql_opimizer_node)
-graph.add_node("agent", assistant)
-graph.add_node("tools", tool_node)
+#UPD узел инспекции SQL (валидатор + оптимизатор параллельно) и проверка плана
+graph.add_node("inspection", RunnableLambda(sql_inspection_node, afunc=asql_inspection_node))
+graph.add_node("cost_gate", sql_cost_gate_node)
+graph.add_node("semantic_cache", semantic_cache_node)
+# Узлы с I/O имеют асинхронную реализацию для app.ainvoke (FastAPI);
+# синхронные узлы LangGraph при ainvoke выполняет в пуле потоков
+graph.add_node("agent", RunnableLambda(assistant, afunc=aassistant))
+graph.add_node("tools", RunnableLambda(tool_node, afunc=tool_node.acall))
 # 4. Настраиваем логику переходов
 
-graph.set_entry_point("agent")
+# Вход — семантический кэш: для похожего вопроса SQL берется готовым, иначе работает агент
+graph.set_entry_point("semantic_cache")
+graph.add_conditional_edges("semantic_cache", route_semantic_cache, {"agent": "agent", END: END})
 
 #UPD Перестраиваем логику переходов
 def route(state: AgentState) -> str:
@@ -193,32 +476,37 @@ def route(state: AgentState) -> str:
     # Если инструменты есть, проверяем какие именно
     for call in last.tool_calls:
         if call['name'] == 'user_confirmation':
-            # Если агент хочет подтвердить SQL, отправляем в цепочку проверок
-            return "validator"
+            # Если агент хочет подтвердить SQL, отправляем на инспекцию
+            return "inspection"
     
     # Если это любые другие инструменты (например, get_db_schema), идем в обычный tool_node
     return "tools"
 
+
+def route_inspection(state: AgentState) -> str:
+    # Отклоненный инспекцией запрос агент все равно перепишет — EXPLAIN для него не нужен
+    return "tools" if state.get("inspection_status") == "rejected" else "cost_gate"
+
 # Добавляем условные переходы
-#UPD Настроиваем цепочку: Validator -> Optimizer -> Tools (Confirmation)
+#UPD Настроиваем цепочку: Inspection (Validator || Optimizer) -> Cost gate (EXPLAIN) -> Tools (Confirmation)
 graph.add_conditional_edges("agent", route, {
-    "validator": "validator", 
+    "inspection": "inspection", 
     "tools": "tools", 
     END: END
     })
 # После выполнения любого инструмента возвращаемся к агенту, 
 # чтобы он проанализировал результат (схему или данные из БД)
-graph.add_edge("validator", "optimizer")
-graph.add_edge("optimizer", "tools") # Отправляем уже чистый и быстрый SQL в инструменты
+graph.add_conditional_edges("inspection", route_inspection, {"cost_gate": "cost_gate", "tools": "tools"})
+graph.add_edge("cost_gate", "tools") # Отправляем уже чистый и быстрый SQL в инструменты
 graph.add_edge("tools", "agent")
 
 
 # 4. Компиляция
 load_dotenv()
 
-# Используем Memory checkpointer - он стабильно работает
-# PostgreSQL checkpointer требует совместимости версий
-from langgraph.checkpoint.memory import MemorySaver
-memory_checkpointer = MemorySaver()
+# Чекпоинтер выбирается через CHECKPOINT_BACKEND (memory | sqlite | postgres), см. src/checkpointer.py:
+# sqlite/postgres переживают перезапуск, хранят ограниченное число чекпоинтов на тред и сжимают блобы
+from src.checkpointer import create_checkpointer
+checkpointer = create_checkpointer()
 
-app = graph.compile(checkpointer=memory_checkpointer)
\ No newline at end of file
+app = graph.compile(checkpointer=checkpointer)
\ No newline at end of file
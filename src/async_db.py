@@ -0,0 +1,75 @@
+"""
+Асинхронный доступ к PostgreSQL для FastAPI-сервиса (psycopg 3 + AsyncConnectionPool).
+
+Синхронный путь (psycopg2, src/db_pool.py) остается для CLI и скриптов;
+в асинхронном графе (app.ainvoke) инструменты ходят в базу через этот пул
+и не блокируют event loop, пока запрос ждет ответа сервера.
+"""
+import asyncio
+import os
+
+from src.db_pool import READONLY_SESSION_OPTIONS
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # psycopg 3 нужен только асинхронному пути
+    psycopg = None
+    dict_row = None
+    AsyncConnectionPool = None
+
+
+def get_pg_conninfo() -> str:
+    return psycopg.conninfo.make_conninfo(
+        dbname=os.getenv("DB_NAME", "postgres"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", "postgres"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432")
+    )
+
+
+# Общий асинхронный пул, создается при первом обращении внутри event loop
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+
+async def get_async_pg_pool():
+    global _async_pool
+    if AsyncConnectionPool is None:
+        raise RuntimeError("Для асинхронного доступа к базе установите psycopg[binary] и psycopg-pool")
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                # Те же настройки, что у синхронного пула (DB_POOL_*)
+                pool = AsyncConnectionPool(
+                    get_pg_conninfo(),
+                    # Сессия только на чтение, как у синхронного пула (чекпоинтер берет свои соединения)
+                    kwargs={"options": READONLY_SESSION_OPTIONS},
+                    min_size=int(os.getenv("DB_POOL_MIN", "1")),
+                    max_size=int(os.getenv("DB_POOL_MAX", "10")),
+                    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+                    timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10")),
+                    # Соединение проверяется перед выдачей (аналог health check синхронного пула)
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                _async_pool = pool
+    return _async_pool
+
+
+async def close_async_pg_pool():
+    global _async_pool
+    async with _async_pool_lock:
+        if _async_pool is not None:
+            await _async_pool.close()
+            _async_pool = None
+
+
+def async_pool_stats() -> dict:
+    """Метрики асинхронного пула (пусто, если он еще не создан)."""
+    if _async_pool is None:
+        return {}
+    return _async_pool.get_stats()
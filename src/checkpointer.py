@@ -0,0 +1,289 @@
+"""
+Хранилище чекпоинтов LangGraph (история тредов).
+
+CHECKPOINT_BACKEND:
+- memory   — MemorySaver в памяти процесса (для отладки, теряется при перезапуске);
+- sqlite   — файл CHECKPOINT_SQLITE_PATH (один узел);
+- postgres — таблицы LangGraph в той же базе (DB_*), общий для нескольких узлов.
+
+Для sqlite/postgres хранилище ограничено:
+- у каждого треда остаются только CHECKPOINT_KEEP_PER_THREAD последних чекпоинтов;
+- треды без активности дольше CHECKPOINT_TTL секунд удаляются целиком;
+- значения сериализуются и сжимаются zlib (если блоб больше CHECKPOINT_COMPRESS_MIN_BYTES).
+Очистку выполняет фоновый поток раз в CHECKPOINT_PRUNE_INTERVAL секунд.
+
+Граф не использует DeltaChannel (messages хранится целиком в каждом чекпоинте),
+поэтому удаление старых чекпоинтов треда не ломает восстановление состояния.
+"""
+import abc
+import asyncio
+import os
+import threading
+import time
+import zlib
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.encrypted import EncryptedSerializer
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # langgraph-checkpoint-sqlite нужен только для CHECKPOINT_BACKEND=sqlite
+    SqliteSaver = None
+
+try:
+    from langgraph.checkpoint.postgres import PostgresSaver
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+except ImportError:  # langgraph-checkpoint-postgres нужен только для CHECKPOINT_BACKEND=postgres
+    PostgresSaver = None
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", str(7 * 24 * 3600)))
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "5"))
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "600"))
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "512"))
+
+
+class ZlibCodec:
+    """
+    "Шифр" для EncryptedSerializer, который просто сжимает байты zlib.
+    EncryptedSerializer — штатная точка расширения LangGraph для преобразования блобов,
+    при этом сохраняется allowlist десериализации JsonPlusSerializer.
+    """
+    def __init__(self, min_bytes: int = CHECKPOINT_COMPRESS_MIN_BYTES, level: int = 6):
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def encrypt(self, plaintext: bytes) -> tuple:
+        if len(plaintext) < self.min_bytes:
+            return "raw", plaintext
+        return "zlib", zlib.compress(plaintext, self.level)
+
+    def decrypt(self, ciphername: str, ciphertext: bytes) -> bytes:
+        if ciphername == "zlib":
+            return zlib.decompress(ciphertext)
+        if ciphername == "raw":
+            return ciphertext
+        raise ValueError(f"Неизвестный формат блоба чекпоинта: {ciphername}")
+
+
+def compact_serializer() -> EncryptedSerializer:
+    return EncryptedSerializer(ZlibCodec(), JsonPlusSerializer())
+
+
+class _BoundedSaverMixin(abc.ABC):
+    """
+    Общая часть sqlite/postgres: учет активности тредов, очистка и async-методы.
+    Готовые SqliteSaver/PostgresSaver синхронные, а граф вызывается и через invoke (CLI),
+    и через ainvoke (FastAPI) — async-методы выполняют синхронные в пуле потоков.
+    """
+    @abc.abstractmethod
+    def _touch(self, thread_id: str):
+        """Отмечает активность треда (для evict_idle)."""
+
+    @abc.abstractmethod
+    def evict_idle(self, ttl: float) -> int:
+        """Удаляет треды без активности дольше ttl секунд; возвращает их число."""
+
+    @abc.abstractmethod
+    def prune_history(self, keep: int) -> int:
+        """Оставляет последние keep чекпоинтов каждого треда; возвращает число удаленных."""
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"])
+        return result
+
+    def cleanup(self, ttl: float = CHECKPOINT_TTL, keep: int = CHECKPOINT_KEEP_PER_THREAD) -> dict:
+        # Не prune(): BaseCheckpointSaver.prune(thread_ids, strategy=...) — другой API LangGraph
+        return {"threads_evicted": self.evict_idle(ttl), "checkpoints_pruned": self.prune_history(keep)}
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = ""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config, channels):
+        return await asyncio.to_thread(lambda: self.get_delta_channel_history(config=config, channels=channels))
+
+
+if SqliteSaver is not None:
+    class BoundedSqliteSaver(_BoundedSaverMixin, SqliteSaver):
+        def setup(self):
+            if self.is_setup:
+                return
+            super().setup()
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            self.conn.commit()
+
+        def _touch(self, thread_id: str):
+            with self.cursor() as cur:
+                cur.execute("INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                            (thread_id, time.time()))
+
+        def delete_thread(self, thread_id: str):
+            super().delete_thread(thread_id)
+            with self.cursor() as cur:
+                cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (thread_id,))
+
+        def evict_idle(self, ttl: float) -> int:
+            with self.cursor(transaction=False) as cur:
+                cur.execute("SELECT thread_id FROM thread_activity WHERE updated_at < ?", (time.time() - ttl,))
+                idle = [row[0] for row in cur.fetchall()]
+            for thread_id in idle:
+                self.delete_thread(thread_id)
+            return len(idle)
+
+        def prune_history(self, keep: int) -> int:
+            # Оставляем keep последних чекпоинтов в каждом (thread_id, checkpoint_ns);
+            # id чекпоинтов монотонны (uuid6), поэтому порядок по checkpoint_id — хронологический
+            stale = """
+                SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                    SELECT thread_id, checkpoint_ns, checkpoint_id,
+                           ROW_NUMBER() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn
+                    FROM checkpoints
+                ) WHERE rn > ?
+            """
+            with self.cursor() as cur:
+                cur.execute(f"DELETE FROM writes WHERE (thread_id, checkpoint_ns, checkpoint_id) IN ({stale})", (keep,))
+                cur.execute(f"DELETE FROM checkpoints WHERE (thread_id, checkpoint_ns, checkpoint_id) IN ({stale})",
+                            (keep,))
+                return cur.rowcount
+
+
+if PostgresSaver is not None:
+    class BoundedPostgresSaver(_BoundedSaverMixin, PostgresSaver):
+        def setup(self):
+            super().setup()
+            with self._cursor() as cur:
+                cur.execute("""CREATE TABLE IF NOT EXISTS checkpoint_thread_activity (
+                                   thread_id TEXT PRIMARY KEY, updated_at DOUBLE PRECISION NOT NULL)""")
+
+        def _touch(self, thread_id: str):
+            with self._cursor() as cur:
+                cur.execute("""INSERT INTO checkpoint_thread_activity (thread_id, updated_at) VALUES (%s, %s)
+                               ON CONFLICT (thread_id) DO UPDATE SET updated_at = EXCLUDED.updated_at""",
+                            (thread_id, time.time()))
+
+        def delete_thread(self, thread_id: str):
+            super().delete_thread(thread_id)
+            with self._cursor() as cur:
+                cur.execute("DELETE FROM checkpoint_thread_activity WHERE thread_id = %s", (thread_id,))
+
+        def evict_idle(self, ttl: float) -> int:
+            with self._cursor() as cur:
+                cur.execute("SELECT thread_id FROM checkpoint_thread_activity WHERE updated_at < %s",
+                            (time.time() - ttl,))
+                idle = [row["thread_id"] for row in cur.fetchall()]
+            for thread_id in idle:
+                self.delete_thread(thread_id)
+            return len(idle)
+
+        def prune_history(self, keep: int) -> int:
+            # Один оператор (одна транзакция). Блобы каналов хранятся по версиям: кандидаты на удаление —
+            # только версии, на которые ссылались удаленные чекпоинты, и только если на них не ссылается
+            # ни один оставшийся. Новые версии идущего put сюда не попадают (put пишет блобы раньше
+            # строки чекпоинта), а неизменные каналы по-прежнему ссылаются из последнего чекпоинта.
+            # Изменения CTE не видны остальному оператору, поэтому stale исключаем явно.
+            with self._cursor() as cur:
+                cur.execute("""
+                    WITH stale AS (
+                        SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                            SELECT thread_id, checkpoint_ns, checkpoint_id,
+                                   ROW_NUMBER() OVER (PARTITION BY thread_id, checkpoint_ns
+                                                      ORDER BY checkpoint_id DESC) AS rn
+                            FROM checkpoints
+                        ) ranked WHERE rn > %s
+                    ), deleted_writes AS (
+                        DELETE FROM checkpoint_writes w USING stale s
+                        WHERE w.thread_id = s.thread_id AND w.checkpoint_ns = s.checkpoint_ns
+                          AND w.checkpoint_id = s.checkpoint_id
+                    ), deleted AS (
+                        DELETE FROM checkpoints c USING stale s
+                        WHERE c.thread_id = s.thread_id AND c.checkpoint_ns = s.checkpoint_ns
+                          AND c.checkpoint_id = s.checkpoint_id
+                        RETURNING c.thread_id, c.checkpoint_ns, c.checkpoint
+                    ), candidate_blobs AS (
+                        SELECT DISTINCT d.thread_id, d.checkpoint_ns, v.key AS channel, v.value AS version
+                        FROM deleted d, jsonb_each_text(d.checkpoint -> 'channel_versions') v
+                    ), deleted_blobs AS (
+                        DELETE FROM checkpoint_blobs b USING candidate_blobs cb
+                        WHERE b.thread_id = cb.thread_id AND b.checkpoint_ns = cb.checkpoint_ns
+                          AND b.channel = cb.channel AND b.version = cb.version
+                          AND NOT EXISTS (
+                              SELECT 1 FROM checkpoints c
+                              WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+                                AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+                                AND NOT EXISTS (
+                                    SELECT 1 FROM stale s
+                                    WHERE s.thread_id = c.thread_id AND s.checkpoint_ns = c.checkpoint_ns
+                                      AND s.checkpoint_id = c.checkpoint_id
+                                )
+                          )
+                    )
+                    SELECT count(*) AS pruned FROM deleted
+                """, (keep,))
+                return cur.fetchone()["pruned"]
+
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND):
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        if SqliteSaver is None:
+            raise RuntimeError("Для CHECKPOINT_BACKEND=sqlite установите langgraph-checkpoint-sqlite")
+        import sqlite3
+        conn = sqlite3.connect(CHECKPOINT_SQLITE_PATH, check_same_thread=False)
+        saver = BoundedSqliteSaver(conn, serde=compact_serializer())
+        saver.setup()
+        return saver
+    if backend == "postgres":
+        if PostgresSaver is None:
+            raise RuntimeError("Для CHECKPOINT_BACKEND=postgres установите langgraph-checkpoint-postgres и psycopg-pool")
+        from src.async_db import get_pg_conninfo
+        pool = ConnectionPool(
+            get_pg_conninfo(),
+            min_size=1,
+            max_size=int(os.getenv("CHECKPOINT_POOL_MAX", "5")),
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        )
+        saver = BoundedPostgresSaver(pool, serde=compact_serializer())
+        saver.setup()
+        return saver
+    raise ValueError(f"Неизвестный CHECKPOINT_BACKEND: {backend} (memory | sqlite | postgres)")
+
+
+def start_pruning(saver, interval: float = CHECKPOINT_PRUNE_INTERVAL):
+    """Фоновый поток периодической очистки (для memory-бэкенда ничего не делает)."""
+    if not isinstance(saver, _BoundedSaverMixin) or interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                result = saver.cleanup()
+                if any(result.values()):
+                    print(f"🧹 [CHECKPOINTS]: {result}")
+            except Exception as e:
+                print(f"🧹 [CHECKPOINTS]: очистка не удалась: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="checkpoint-pruner", daemon=True)
+    thread.start()
+    return thread
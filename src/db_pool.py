@@ -0,0 +1,235 @@
+from collections import deque
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+import psycopg2
+
+# Параметр сессии: каждая транзакция соединения — только чтение, в т.ч. начатая после
+# COMMIT внутри присланной строки (SET TRANSACTION READ ONLY действует лишь до ее конца)
+READONLY_SESSION_OPTIONS = "-c default_transaction_read_only=on"
+
+
+def get_pg_connection(readonly: bool = False):
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME", "postgres"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", "postgres"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432"),
+        **({"options": READONLY_SESSION_OPTIONS} if readonly else {})
+    )
+
+
+def get_readonly_pg_connection():
+    return get_pg_connection(readonly=True)
+
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за acquire_timeout секунд."""
+
+
+class PgConnectionPool:
+    """
+    Потокобезопасный пул соединений psycopg2.
+    - min_size соединений открываются заранее, больше max_size не создается;
+    - соединение старше max_lifetime секунд закрывается при возврате/выдаче;
+    - простаивавшее дольше health_check_interval проверяется SELECT 1 перед выдачей;
+    - если свободных нет, acquire ждет не дольше acquire_timeout и бросает PoolTimeout.
+    """
+    def __init__(self, connect=get_pg_connection, min_size: int = 1, max_size: int = 10,
+                 max_lifetime: float = 1800, acquire_timeout: float = 10, health_check_interval: float = 30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()       # (conn, created_at, last_used)
+        self._created_at = {}      # id(conn) -> время создания для выданных соединений
+        self._size = 0             # Всего открытых соединений (свободных + выданных)
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {"connections_created": 0, "connections_closed": 0, "acquires": 0,
+                       "acquire_timeouts": 0, "health_check_failures": 0, "wait_ms_total": 0.0}
+
+    # --- Внутреннее ---
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn, created_at: float, last_used: float) -> bool:
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_lifetime:
+            return False
+        if now - last_used > self.health_check_interval:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                return False
+        return True
+
+    def _fill_min(self):
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn, created_at = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, created_at, created_at))
+                self._cond.notify()
+
+    # --- Публичный интерфейс ---
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        self._fill_min()
+        while True:
+            candidate, open_new = None, False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Пул соединений закрыт")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["acquire_timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Нет свободных соединений с PostgreSQL за {self.acquire_timeout}s (max_size={self.max_size})"
+                        )
+                    self._waiting += 1
+                    self._cond.wait(remaining)
+                    self._waiting -= 1
+                if self._idle:
+                    # LIFO: самое "теплое" соединение, редкие сами истекут по lifetime
+                    candidate = self._idle.pop()
+                else:
+                    self._size += 1
+                    open_new = True
+
+            if open_new:
+                try:
+                    conn, created_at = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                conn, created_at, last_used = candidate
+                if not self._is_healthy(conn, created_at, last_used):
+                    self._discard(conn)
+                    continue
+
+            with self._cond:
+                self._created_at[id(conn)] = created_at
+                self._stats["acquires"] += 1
+                self._stats["wait_ms_total"] += (time.monotonic() - started) * 1000
+            return conn
+
+    def release(self, conn, broken: bool = False):
+        with self._cond:
+            created_at = self._created_at.pop(id(conn), time.monotonic())
+        if not broken and not conn.closed:
+            try:
+                # Сбрасываем незавершенную транзакцию, чтобы следующий клиент получил чистое соединение
+                conn.rollback()
+            except Exception:
+                broken = True
+        if broken or conn.closed or self._closed or time.monotonic() - created_at > self.max_lifetime:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def stats(self) -> dict:
+        with self._cond:
+            acquires = self._stats["acquires"]
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **{k: v for k, v in self._stats.items() if k != "wait_ms_total"},
+                "avg_wait_ms": round(self._stats["wait_ms_total"] / acquires, 3) if acquires else 0.0,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+
+# Общий пул для всех инструментов, создается при первом обращении
+_pg_pool = None
+_pg_pool_lock = threading.Lock()
+
+
+def get_pg_pool() -> PgConnectionPool:
+    global _pg_pool
+    if _pg_pool is None:
+        with _pg_pool_lock:
+            if _pg_pool is None:
+                # Пул обслуживает только чтение (схема, EXPLAIN, execute_sql)
+                _pg_pool = PgConnectionPool(
+                    connect=get_readonly_pg_connection,
+                    min_size=int(os.getenv("DB_POOL_MIN", "1")),
+                    max_size=int(os.getenv("DB_POOL_MAX", "10")),
+                    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+                    acquire_timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10")),
+                    health_check_interval=float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30")),
+                )
+    return _pg_pool
+
+
+def close_pg_pool():
+    global _pg_pool
+    with _pg_pool_lock:
+        if _pg_pool is not None:
+            _pg_pool.close()
+            _pg_pool = None
@@ -0,0 +1,71 @@
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+import queue
+import threading
+import time
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Диспетчер эмбеддингов для конкурентных поисков.
+    Одновременные вызовы embed_query из разных потоков собираются в батч
+    (до max_batch текстов или max_wait_ms ожидания) и считаются одним проходом
+    модели через embed_documents; каждый вызывающий получает свой вектор.
+    """
+    def __init__(self, embeddings: Embeddings, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.stats = {"batches": 0, "items": 0, "max_batch_seen": 0}
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                # Для sentence-transformers эмбеддинг запроса и документа считаются одинаково
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+
+    def embed_query(self, text: str) -> list:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts: list) -> list:
+        # Загрузка документов и так идет батчами — отправляем напрямую
+        return self.embeddings.embed_documents(texts)
+
+    def batch_info(self) -> dict:
+        batches = self.stats["batches"]
+        return {**self.stats, "avg_batch": round(self.stats["items"] / batches, 2) if batches else 0.0}
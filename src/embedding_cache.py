@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    # Одинаковые вопросы с разными пробелами/переносами должны давать один ключ
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Двухуровневый кэш эмбеддингов поверх любой модели LangChain:
+    1. LRU в памяти процесса (max_size векторов);
+    2. необязательный кэш на диске в SQLite (persist_path), общий между перезапусками.
+    Ключ — sha256 от имени модели и нормализованного текста.
+    """
+    def __init__(self, embeddings: Embeddings, model_name: str, max_size: int = 10000,
+                 persist_path: str = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_size = max_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{normalize_text(text)}".encode()).hexdigest()
+
+    def _remember(self, key: str, vector: list):
+        # Вызывается под self._lock
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key: str):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                    return vector
+            self.stats["misses"] += 1
+            return None
+
+    def _store(self, items: list):
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+                )
+                self._db.commit()
+
+    def embed_query(self, text: str) -> list:
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store([(key, vector)])
+        return vector
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [self._key(text) for text in texts]
+        vectors = [self._lookup(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Все промахи считаем одним батчем
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+            self._store([(keys[i], vectors[i]) for i in missing])
+        return vectors
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            total = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._memory),
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+            }
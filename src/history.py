@@ -0,0 +1,142 @@
+"""
+Ограниченная история диалога для промпта агента.
+
+- последние keep_turns ходов (ход = сообщение пользователя и все, что после него) идут как есть;
+- в более старых ходах вывод инструментов заменяется короткой заглушкой;
+- если история все равно не помещается в token_budget, самые старые ходы сворачиваются
+  в скользящее резюме (AgentState["summary"]); AgentState["summarized_until"] — сколько
+  сообщений от начала треда уже учтено в резюме.
+Токены считаются локально (src/token_counter.py).
+"""
+import os
+
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, AIMessage
+
+from config.prompts import summary_sys_msg
+from src.token_counter import count_tokens
+
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "3"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "400"))
+HISTORY_FOLD_TARGET = float(os.getenv("HISTORY_FOLD_TARGET", "0.6"))
+# Тег вызовов LLM для резюме: их токены не транслируются пользователю (src/streaming.py)
+SUMMARY_TAG = "history_summary"
+
+
+def message_tokens(msg) -> int:
+    tokens = count_tokens(msg.content if isinstance(msg.content, str) else str(msg.content))
+    if isinstance(msg, AIMessage) and msg.tool_calls:
+        tokens += count_tokens(str([(c["name"], c["args"]) for c in msg.tool_calls]))
+    return tokens + 4  # Служебная разметка роли
+
+
+def stub_tool_message(msg: ToolMessage) -> ToolMessage:
+    """Заглушка вместо старого вывода инструмента (tool_call_id сохраняется для провайдера)."""
+    tokens = count_tokens(str(msg.content))
+    return ToolMessage(
+        content=f"[вывод {msg.name} скрыт, ~{tokens} токенов; при необходимости вызови инструмент повторно]",
+        tool_call_id=msg.tool_call_id,
+        name=msg.name,
+    )
+
+
+def split_turns(messages, start: int = 0) -> list:
+    """Границы ходов [(начало, конец)) начиная с индекса start; ход начинается с HumanMessage."""
+    turns, begin = [], start
+    for i in range(start, len(messages)):
+        if isinstance(messages[i], HumanMessage) and i > begin:
+            turns.append((begin, i))
+            begin = i
+    if begin < len(messages):
+        turns.append((begin, len(messages)))
+    return turns
+
+
+def render_for_summary(messages) -> str:
+    lines = []
+    for msg in messages:
+        if isinstance(msg, ToolMessage):
+            content = stub_tool_message(msg).content if message_tokens(msg) > 200 else msg.content
+            lines.append(f"[{msg.name}]: {content}")
+        elif isinstance(msg, AIMessage) and msg.tool_calls:
+            calls = "; ".join(f"{c['name']}({c['args']})" for c in msg.tool_calls)
+            lines.append(f"Ассистент вызывает: {calls}" + (f"\n{msg.content}" if msg.content else ""))
+        else:
+            role = "Пользователь" if isinstance(msg, HumanMessage) else "Ассистент"
+            lines.append(f"{role}: {msg.content}")
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    def __init__(self, llm, keep_turns: int = HISTORY_KEEP_TURNS, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_tokens: int = HISTORY_SUMMARY_TOKENS):
+        self.llm = llm
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+
+    def _compact(self, messages, turns, verbatim_turns: int) -> list:
+        result = []
+        for i, (begin, end) in enumerate(turns):
+            verbatim = i >= len(turns) - verbatim_turns
+            for msg in messages[begin:end]:
+                result.append(msg if verbatim or not isinstance(msg, ToolMessage) else stub_tool_message(msg))
+        return result
+
+    def build(self, messages, summary: str = None, summarized_until: int = 0) -> list:
+        """Сообщения для промпта: старые ходы с заглушками; при нехватке бюджета — заглушки везде, кроме текущего хода."""
+        turns = split_turns(messages, min(summarized_until, len(messages)))
+        budget = self.token_budget - count_tokens(summary or "")
+        compact = self._compact(messages, turns, self.keep_turns)
+        if sum(message_tokens(m) for m in compact) > budget:
+            compact = self._compact(messages, turns, 1)
+        return compact
+
+    def fold_point(self, messages, summary: str = None, summarized_until: int = 0):
+        """Индекс, до которого историю нужно свернуть в резюме, чтобы уложиться в бюджет (None — не нужно)."""
+        turns = split_turns(messages, min(summarized_until, len(messages)))
+        foldable = turns[:-self.keep_turns] if self.keep_turns else turns
+        if not foldable:
+            return None
+        stubbed = self._compact(messages, turns, self.keep_turns)
+        # Резюме после сворачивания не длиннее summary_tokens
+        total = sum(message_tokens(m) for m in stubbed) + max(count_tokens(summary or ""), self.summary_tokens)
+        if total <= self.token_budget:
+            return None
+        # Сворачиваем с запасом (до HISTORY_FOLD_TARGET бюджета), чтобы резюме не пересчитывалось каждый ход
+        target = self.token_budget * HISTORY_FOLD_TARGET
+        fold_until = None
+        for begin, end in foldable:
+            if total <= target:
+                break
+            total -= sum(message_tokens(m) for m in self._compact(messages[begin:end], [(0, end - begin)], 0))
+            fold_until = end
+        return fold_until
+
+    def _summary_request(self, messages, summary, summarized_until, fold_until) -> list:
+        return [
+            SystemMessage(content=summary_sys_msg.format(max_tokens=self.summary_tokens)),
+            HumanMessage(content=f"Предыдущее резюме:\n{summary or '(пусто)'}\n\n"
+                                 f"Новая часть диалога:\n{render_for_summary(messages[summarized_until:fold_until])}"),
+        ]
+
+    def update(self, state: dict) -> dict:
+        """Сворачивает старые ходы в резюме, если нужно. Возвращает обновление состояния (или {})."""
+        messages, summary = state["messages"], state.get("summary")
+        summarized_until = state.get("summarized_until", 0)
+        fold_until = self.fold_point(messages, summary, summarized_until)
+        if fold_until is None:
+            return {}
+        response = self.llm.invoke(self._summary_request(messages, summary, summarized_until, fold_until),
+                                   config={"tags": [SUMMARY_TAG]})
+        return {"summary": response.content.strip(), "summarized_until": fold_until}
+
+    async def aupdate(self, state: dict) -> dict:
+        messages, summary = state["messages"], state.get("summary")
+        summarized_until = state.get("summarized_until", 0)
+        fold_until = self.fold_point(messages, summary, summarized_until)
+        if fold_until is None:
+            return {}
+        response = await self.llm.ainvoke(self._summary_request(messages, summary, summarized_until, fold_until),
+                                          config={"tags": [SUMMARY_TAG]})
+        return {"summary": response.content.strip(), "summarized_until": fold_until}
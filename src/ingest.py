@@ -0,0 +1,216 @@
+"""
+Пакетная загрузка базы знаний из папки с документами.
+
+Запуск:
+    python -m src.ingest ./docs --batch-size 256 --parallel 4
+
+    python -m src.ingest ./docs --sync   # ночная переиндексация: только изменения
+
+Файлы (txt/md/pdf) читаются потоково, режутся на чанки, эмбеддинги считаются
+батчами и пишутся в хранилище крупными upsert-ами. Манифест (источник -> ID чанков
+и хэши содержимого) сохраняется после каждого батча, поэтому после сбоя повторный
+запуск продолжит с места остановки. Эмбеддинги считаются только для новых или
+измененных чанков, исчезнувшие чанки измененных файлов удаляются из базы;
+в режиме --sync удаляются и файлы, которых больше нет в папке.
+"""
+import argparse
+import json
+import os
+import time
+
+from src.vector_store import make_point_id, content_hash
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf")
+DEFAULT_MANIFEST_FILE = "./ingest_manifest.json"
+
+
+def iter_files(directory: str, extensions=SUPPORTED_EXTENSIONS):
+    """Обходит папку рекурсивно в стабильном порядке (важно для resume)."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                yield os.path.join(root, name)
+
+
+def read_file(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        # pypdf — необязательная зависимость, нужна только для PDF
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise RuntimeError("Для чтения PDF установите пакет pypdf")
+        reader = PdfReader(path)
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 150):
+    """
+    Режет текст на чанки по абзацам, склеивая соседние абзацы до chunk_size символов.
+    Слишком длинные абзацы режутся окном с перекрытием overlap.
+    """
+    chunks, current = [], ""
+    for paragraph in (p.strip() for p in text.split("\n\n")):
+        if not paragraph:
+            continue
+        if len(paragraph) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            step = max(chunk_size - overlap, 1)
+            chunks.extend(paragraph[i:i + chunk_size] for i in range(0, len(paragraph), step))
+            continue
+        if current and len(current) + len(paragraph) + 2 > chunk_size:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _file_signature(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def load_manifest(manifest_file: str) -> dict:
+    """Манифест: {"files": {путь: {"signature": ..., "chunks": {id_чанка: хэш_содержимого}}}}."""
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifest.setdefault("files", {})
+        return manifest
+    return {"files": {}}
+
+
+def save_manifest(manifest_file: str, manifest: dict):
+    # Пишем через временный файл, чтобы не оставить битый манифест при падении
+    tmp = f"{manifest_file}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, manifest_file)
+
+
+def ingest_directory(directory: str, vector_db=None, batch_size: int = 256, parallel: int = 1,
+                     chunk_size: int = 1000, overlap: int = 150, manifest_file: str = DEFAULT_MANIFEST_FILE,
+                     resume: bool = True, sync: bool = False) -> dict:
+    """
+    Загружает все документы из папки. Чанки копятся в буфер и отправляются
+    в VectorManager.add_docs, когда набирается batch_size * parallel штук.
+    Файл попадает в манифест только после того, как ушли все его чанки.
+
+    У измененного файла новые ID чанков всегда сверяются с прошлой записью манифеста:
+    устаревшие чанки стираются из хранилища, а при resume/sync чанки, которые уже
+    есть в манифесте, повторно не эмбеддятся.
+    sync=True — дополнительно удаляет из хранилища файлы, которых больше нет в папке.
+    """
+    if vector_db is None:
+        from src.vector_store import get_vector_db
+        vector_db = get_vector_db()
+
+    # Прошлый манифест читаем всегда: без него старые чанки измененных файлов остались бы в базе
+    stored = load_manifest(manifest_file)
+    manifest = stored if (resume or sync) else {"files": {}}
+    known_files, previous_files = manifest["files"], dict(stored["files"])
+    reuse_chunks = resume or sync
+    flush_size = batch_size * max(parallel, 1)
+
+    texts, metadatas, pending_files = [], [], []
+    stats = {"files": 0, "chunks": 0, "skipped": 0, "failed": 0, "deleted": 0}
+    seen_files = set()
+    started = time.perf_counter()
+
+    def flush():
+        if texts:
+            vector_db.add_docs(texts, metadatas, batch_size=batch_size, parallel=parallel)
+            stats["chunks"] += len(texts)
+        for rel_path, entry in pending_files:
+            known_files[rel_path] = entry
+        stats["files"] += len(pending_files)
+        save_manifest(manifest_file, manifest)
+        texts.clear()
+        metadatas.clear()
+        pending_files.clear()
+
+    for path in iter_files(directory):
+        rel_path = os.path.relpath(path, directory)
+        seen_files.add(rel_path)
+        signature = _file_signature(path)
+        previous = known_files.get(rel_path)
+        if previous and previous.get("signature") == signature:
+            stats["skipped"] += 1
+            continue
+        try:
+            chunks = chunk_text(read_file(path), chunk_size, overlap)
+        except Exception as e:
+            print(f"⚠️ Не удалось прочитать {rel_path}: {e}")
+            stats["failed"] += 1
+            continue
+
+        chunk_hashes = {}
+        old_chunks = previous_files.get(rel_path, {}).get("chunks", {})
+        for i, chunk in enumerate(chunks):
+            chunk_id = make_point_id(chunk, rel_path)
+            chunk_hashes[chunk_id] = content_hash(chunk)
+            if reuse_chunks and chunk_id in old_chunks:
+                continue  # Содержимое не изменилось — эмбеддинг уже в базе
+            texts.append(chunk)
+            metadatas.append({"source": rel_path, "chunk": i})
+        stale = [chunk_id for chunk_id in old_chunks if chunk_id not in chunk_hashes]
+        if stale:
+            vector_db.delete(stale)
+            stats["deleted"] += len(stale)
+        pending_files.append((rel_path, {"signature": signature, "chunks": chunk_hashes}))
+
+        if len(texts) >= flush_size:
+            flush()
+    flush()
+
+    if sync:
+        # Файлы, которых больше нет в папке, удаляются вместе со всеми чанками
+        for rel_path in [p for p in known_files if p not in seen_files]:
+            stale = list(known_files.pop(rel_path).get("chunks", {}))
+            vector_db.delete(stale)
+            stats["deleted"] += len(stale)
+        save_manifest(manifest_file, manifest)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["docs_per_sec"] = round(stats["files"] / elapsed, 2) if elapsed else 0.0
+    stats["chunks_per_sec"] = round(stats["chunks"] / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Папка с документами (txt/md/pdf)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Размер батча эмбеддингов и upsert")
+    parser.add_argument("--parallel", type=int, default=1, help="Сколько батчей обрабатывать одновременно")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_FILE, help="Файл манифеста (прогресс и ID чанков)")
+    parser.add_argument("--no-resume", action="store_true", help="Игнорировать сохраненный прогресс")
+    parser.add_argument("--sync", action="store_true", help="Инкрементальная синхронизация с удалением устаревшего")
+    args = parser.parse_args()
+
+    stats = ingest_directory(
+        args.directory,
+        batch_size=args.batch_size,
+        parallel=args.parallel,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        manifest_file=args.manifest,
+        resume=not args.no_resume,
+        sync=args.sync
+    )
+    print(f"✅ Загружено файлов: {stats['files']}, чанков: {stats['chunks']} "
+          f"(пропущено: {stats['skipped']}, ошибок: {stats['failed']}, удалено чанков: {stats['deleted']}) за {stats['seconds']}s")
+    print(f"⚡ Пропускная способность: {stats['docs_per_sec']} docs/sec, {stats['chunks_per_sec']} chunks/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from collections import Counter
+import math
+import re
+import threading
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Грубый стемминг для русского: длинные слова обрезаются до префикса,
+# чтобы "отпуск", "отпуска" и "отпуском" совпадали. Токены с цифрами
+# (номера статей, коды заявок) остаются как есть.
+STEM_PREFIX = 6
+# На маленьком корпусе частота термина ничего не говорит — стоп-слова по max_df не отсекаются
+STOPWORD_MIN_DOCS = 10
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token.isalpha() and len(token) > STEM_PREFIX:
+            token = token[:STEM_PREFIX]
+        tokens.append(token)
+    return tokens
+
+
+def matches_filters(payload: dict, filters: dict = None) -> bool:
+    """Та же семантика фильтров, что и build_filter для Qdrant: равенство или "любое из" списка."""
+    if not filters:
+        return True
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            if payload.get(key) not in value:
+                return False
+        elif payload.get(key) != value:
+            return False
+    return True
+
+
+class BM25Index:
+    """
+    Инвертированный индекс BM25 в памяти процесса.
+    Обновляется инкрементально (add/remove), поиск не требует модели эмбеддингов.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}   # term -> {doc_id: tf}
+        self._docs = {}       # doc_id -> (длина документа в токенах, payload)
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id, text: str, payload: dict = None):
+        counts = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self._docs:
+                self.remove(doc_id)
+            length = sum(counts.values())
+            self._docs[doc_id] = (length, payload if payload is not None else {"text": text})
+            self._total_len += length
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id):
+        with self._lock:
+            entry = self._docs.pop(doc_id, None)
+            if entry is None:
+                return
+            self._total_len -= entry[0]
+            text = entry[1].get("text", "")
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def search(self, query: str, limit: int = 10, filters: dict = None,
+               min_coverage: float = 0.0, max_df: float = 1.0) -> list:
+        """
+        Возвращает список (doc_id, score, payload), отсортированный по убыванию score.
+        min_coverage — порог релевантности: доля "веса" запроса (сумма IDF его терминов,
+        незнакомые индексу термины — с максимальным IDF), которая встречается в документе.
+        max_df — термины, встречающиеся в большей доле документов, считаются стоп-словами
+        и не учитываются (запрос только из стоп-слов ничего не находит).
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs or not terms:
+                return []
+            avg_len = self._total_len / n_docs
+            max_idf = math.log(1 + (n_docs + 0.5) / 0.5)
+            scores, coverage, query_weight = {}, {}, 0.0
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    query_weight += max_idf
+                    continue
+                if n_docs >= STOPWORD_MIN_DOCS and len(postings) > max_df * n_docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                query_weight += idf
+                for doc_id, tf in postings.items():
+                    length = self._docs[doc_id][0]
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+                    coverage[doc_id] = coverage.get(doc_id, 0.0) + idf
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for doc_id, score in ranked:
+                if coverage[doc_id] < min_coverage * query_weight:
+                    continue
+                payload = self._docs[doc_id][1]
+                if matches_filters(payload, filters):
+                    results.append((doc_id, score, payload))
+                    if len(results) >= limit:
+                        break
+            return results
+
+
+def reciprocal_rank_fusion(rankings: list, weights: list, k: int = 60) -> list:
+    """
+    Слияние нескольких ранжирований (списков doc_id) по RRF:
+    score(d) = sum(w_i / (k + rank_i(d))). Возвращает doc_id по убыванию score.
+    """
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
@@ -4,9 +4,16 @@ from langfuse.langchain import CallbackHandler
 import os
 from dotenv import load_dotenv
 from langfuse import Langfuse
+from src.llm_router import LLMRouter
 # Загружаем переменные из .env файла
 load_dotenv()
 
+LLM_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1")
+# Таймаут одного HTTP-запроса к модели (секунды)
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+# 1 — роли обслуживает LLMRouter (src/llm_router.py), 0 — одна модель, как раньше
+LLM_ROUTER_ENABLED = os.getenv("LLM_ROUTER_ENABLED", "1") == "1"
+
 langfuse_handler = CallbackHandler()
 
 #Создадим класс для нашей LLM для мониторинга его через репозиторий langfuse
@@ -18,29 +25,38 @@ class LLMManager:
     def __init__(self, model_id: str, temperature: float = 0.0):
         self.model_id = model_id
         self.temperature = temperature
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = LLM_BASE_URL
         self.api_key = OPENAI_API_KEY  # Загружаем ОДИН РАЗ
 
-    def create_client(self) -> ChatOpenAI:
+    def create_client(self, max_retries: int = 2) -> ChatOpenAI:
         return ChatOpenAI(
             model=self.model_id,
             temperature=self.temperature,
             api_key=OPENAI_API_KEY,
             base_url=self.base_url,
+            timeout=LLM_REQUEST_TIMEOUT,
+            max_retries=max_retries,
             # Теперь каждый созданный клиент автоматически шлет логи в Langfuse
             callbacks=[langfuse_handler] # Подключаем мониторинг
         )
 
+
+def create_role_llm(role: str, models_env: str, default_models: str, temperature: float):
+    """
+    Модель для роли. Кандидаты — через запятую в переменной models_env (первый — основной).
+    Роутер сам переключается между ними, поэтому встроенные повторы клиента отключены:
+    иначе 429 от одного провайдера ждал бы backoff вместо перехода к другому.
+    """
+    models = [m.strip() for m in os.getenv(models_env, default_models).split(",") if m.strip()]
+    if not LLM_ROUTER_ENABLED:
+        return LLMManager(model_id=models[0], temperature=temperature).create_client()
+    candidates = [LLMManager(model_id=m, temperature=temperature).create_client(max_retries=0) for m in models]
+    return LLMRouter(role=role, candidates=candidates, callbacks=[langfuse_handler])
+
 # Наш АГЕНТ (Оркестратор)
 # MiMo-v2: Быстрый, дешевый, отлично справляется с маршрутизацией
-llm = LLMManager(
-    model_id="xiaomi/mimo-v2-flash:free", 
-    temperature=0.4
-).create_client()
+llm = create_role_llm("agent", "LLM_AGENT_MODELS", "xiaomi/mimo-v2-flash:free", temperature=0.4)
 
 # Наш ИНСПЕКТОР (Валидатор и Оптимизатор)
 # Devstral: Специализированная модель для кода, идеальна для SQL-верификации
-llm_inspector = LLMManager(
-    model_id="mistralai/devstral-2512:free", 
-    temperature=0.0
-).create_client()
\ No newline at end of file
+llm_inspector = create_role_llm("inspector", "LLM_INSPECTOR_MODELS", "mistralai/devstral-2512:free", temperature=0.0)
\ No newline at end of file
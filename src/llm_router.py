@@ -0,0 +1,560 @@
+"""
+Маршрутизатор LLM: несколько моделей-кандидатов на одну роль (агент, инспектор).
+
+- По каждой модели ведется скользящая статистика: задержка полного ответа и первого
+  токена (для стриминга), доля ошибок, число хеджей и побед.
+- Кандидаты упорядочиваются по медианной задержке со штрафом за ошибки; модели
+  "на остывании" (после 429 с Retry-After или при высокой доле сбоев) уходят в конец списка;
+  изредка первым идет второй кандидат, чтобы его статистика не устаревала.
+- Hedging: если запрос не ответил за ROUTER_HEDGE_PERCENTILE-й перцентиль своей задержки,
+  параллельно уходит запрос к следующему кандидату; побеждает первый ответ, второй отменяется.
+- Failover: при 429/5xx/таймауте/обрыве соединения сразу пробуем следующего кандидата;
+  прочие ошибки (400, 401 ...) пробрасываются — у другой модели они повторятся.
+- Кандидаты вызываются через публичный API (generate/agenerate/stream/astream) с дочерним
+  менеджером колбэков: в трейсе (Langfuse) видно, какая модель ответила, а какая была хеджем.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManager
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import ensure_config
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr, model_validator
+
+try:
+    import openai
+except ImportError:  # Без openai SDK ошибки классифицируются только по status_code
+    openai = None
+
+# Сколько последних запросов к модели учитывает статистика
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "50"))
+ROUTER_HEDGE_ENABLED = os.getenv("ROUTER_HEDGE_ENABLED", "1") == "1"
+# Второй запрос уходит, если первый не ответил за этот перцентиль задержки модели
+ROUTER_HEDGE_PERCENTILE = float(os.getenv("ROUTER_HEDGE_PERCENTILE", "90"))
+ROUTER_HEDGE_MIN_SAMPLES = int(os.getenv("ROUTER_HEDGE_MIN_SAMPLES", "5"))
+# Порог хеджа, пока статистики мало, и нижняя граница порога (мс)
+ROUTER_HEDGE_DEFAULT_MS = float(os.getenv("ROUTER_HEDGE_DEFAULT_MS", "8000"))
+ROUTER_HEDGE_MIN_MS = float(os.getenv("ROUTER_HEDGE_MIN_MS", "300"))
+# Остывание модели: если среди последних ROUTER_COOLDOWN_WINDOW запросов доля сбоев
+# не меньше ROUTER_COOLDOWN_ERROR_RATE (429 с Retry-After — на указанное провайдером время)
+ROUTER_COOLDOWN_S = float(os.getenv("ROUTER_COOLDOWN_S", "30"))
+ROUTER_COOLDOWN_WINDOW = int(os.getenv("ROUTER_COOLDOWN_WINDOW", "20"))
+ROUTER_COOLDOWN_ERROR_RATE = float(os.getenv("ROUTER_COOLDOWN_ERROR_RATE", "0.5"))
+# Оценка задержки модели без статистики (мс): порядок кандидатов из конфигурации сохраняется
+ROUTER_PRIOR_MS = float(os.getenv("ROUTER_PRIOR_MS", "2000"))
+# Доля запросов, где первым идет второй по рейтингу кандидат (иначе его статистика не обновляется)
+ROUTER_EXPLORE_RATE = float(os.getenv("ROUTER_EXPLORE_RATE", "0.05"))
+ROUTER_MAX_WORKERS = int(os.getenv("ROUTER_MAX_WORKERS", "16"))
+# Тег дочерних запусков кандидатов: их токены дублируют токены роутера (см. src/streaming.py)
+ROUTER_CANDIDATE_TAG = "llm_router_candidate"
+
+# Потоки для синхронных запросов (invoke): проигравший хедж не прервать, его ответ просто не ждем
+ROUTER_POOL = ThreadPoolExecutor(max_workers=ROUTER_MAX_WORKERS, thread_name_prefix="llm-router")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429, 408, 5xx, таймауты и сетевые ошибки — повод перейти к другой модели."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    if openai is not None and isinstance(error, openai.APIConnectionError):  # В т.ч. APITimeoutError
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+def percentile(samples: list, q: float) -> Optional[float]:
+    if len(samples) < ROUTER_HEDGE_MIN_SAMPLES:
+        return None
+    return float(np.percentile(samples, q))
+
+
+# Запуск роутера (run_id, config) на время выбора кандидата: в _stream/_astream
+# BaseChatModel не передает run_manager, а стримы кандидатов должны стать его дочерними запусками
+_ROUTER_RUN: ContextVar = ContextVar("llm_router_run", default=None)
+
+
+def child_callbacks(run_manager) -> Optional[CallbackManager]:
+    """
+    Колбэки для вызова кандидата: дочерний запуск внутри запуска роутера.
+    У менеджера LLM-запуска нет get_child(), поэтому собираем его так же, как ParentRunManager.
+    """
+    if run_manager is not None:
+        manager = CallbackManager(handlers=[], parent_run_id=run_manager.run_id)
+        manager.set_handlers(run_manager.inheritable_handlers)
+        manager.add_tags(run_manager.inheritable_tags)
+        manager.add_metadata(run_manager.inheritable_metadata)
+    elif _ROUTER_RUN.get() is not None:
+        run_id, config = _ROUTER_RUN.get()
+        manager = CallbackManager.configure(config.get("callbacks"), inheritable_tags=config.get("tags"),
+                                            inheritable_metadata=config.get("metadata"))
+        manager.parent_run_id = run_id
+    else:
+        return None
+    manager.add_tags([ROUTER_CANDIDATE_TAG], inherit=False)
+    return manager
+
+
+def model_name(model) -> str:
+    return getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
+
+
+class ModelStats:
+    """Скользящая статистика одной модели (потокобезопасная)."""
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.latency = deque(maxlen=window)      # мс до полного ответа
+        self.first_token = deque(maxlen=window)  # мс до первого чанка стрима
+        self.outcomes = deque(maxlen=window)     # True — успех
+        self.counters = {"requests": 0, "failures": 0, "hedges": 0, "wins": 0, "cancelled": 0}
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def started(self, hedged: bool):
+        with self._lock:
+            self.counters["requests"] += 1
+            if hedged:
+                self.counters["hedges"] += 1
+
+    def success(self, ms: float, first_token: bool = False, won_hedge: bool = False):
+        with self._lock:
+            (self.first_token if first_token else self.latency).append(ms)
+            self.outcomes.append(True)
+            if won_hedge:
+                self.counters["wins"] += 1
+
+    def failure(self, error: BaseException):
+        with self._lock:
+            self.outcomes.append(False)
+            self.counters["failures"] += 1
+            recent = list(self.outcomes)[-ROUTER_COOLDOWN_WINDOW:]
+            wait_s = retry_after(error) if getattr(error, "status_code", None) == 429 else None
+            if wait_s:
+                # Провайдер сам сказал, сколько ждать
+                self.cooldown_until = time.time() + wait_s
+            elif len(recent) >= ROUTER_COOLDOWN_WINDOW and recent.count(False) >= ROUTER_COOLDOWN_ERROR_RATE * len(recent):
+                self.cooldown_until = time.time() + ROUTER_COOLDOWN_S
+
+    def cancelled(self, ms: float, first_token: bool = False):
+        # Проигравший хедж: его задержка не меньше ms — учитываем как нижнюю оценку,
+        # иначе медленная модель навсегда осталась бы первой в очереди
+        with self._lock:
+            (self.first_token if first_token else self.latency).append(ms)
+            self.counters["cancelled"] += 1
+
+    def samples(self, first_token: bool = False) -> list:
+        with self._lock:
+            return list(self.first_token if first_token else self.latency)
+
+    def percentile(self, q: float, first_token: bool = False) -> Optional[float]:
+        return percentile(self.samples(first_token), q)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def cooling_down(self) -> bool:
+        return self.cooldown_until > time.time()
+
+    def score(self) -> float:
+        """Ожидаемая "цена" запроса: медианная задержка со штрафом за ошибки (меньше — лучше)."""
+        with self._lock:
+            samples = list(self.latency) or list(self.first_token)
+        median = float(np.median(samples)) if samples else ROUTER_PRIOR_MS
+        # Сбой с переключением стоит недорого (429 приходит быстро), поэтому штраф умеренный;
+        # устойчиво сбоящую модель убирает в конец очереди остывание
+        return median * (1 + self.error_rate())
+
+    def info(self) -> dict:
+        def rounded(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            **self.counters,
+            "p50_ms": rounded(self.percentile(50)),
+            "p95_ms": rounded(self.percentile(95)),
+            "first_token_p50_ms": rounded(self.percentile(50, first_token=True)),
+            "first_token_p95_ms": rounded(self.percentile(95, first_token=True)),
+            "error_rate": round(self.error_rate(), 3),
+            "cooling_down": self.cooling_down(),
+        }
+
+
+class LLMRouter(BaseChatModel):
+    """
+    Чат-модель поверх нескольких кандидатов (обычно ChatOpenAI с max_retries=0):
+    снаружи выглядит как одна модель (invoke/ainvoke/stream/astream, bind_tools),
+    внутри выбирает кандидата, хеджирует медленные запросы и переключается при сбоях.
+    Синхронный stream только переключается при сбоях (без хеджа): API работает через astream.
+    """
+    role: str = "default"
+    candidates: List[BaseChatModel]
+    hedge: bool = ROUTER_HEDGE_ENABLED
+    hedge_percentile: float = ROUTER_HEDGE_PERCENTILE
+
+    _stats: dict = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode="after")
+    def _init_router_stats(self):
+        if not self.candidates:
+            raise ValueError(f"LLMRouter({self.role}): не задано ни одной модели")
+        self._stats = {model_name(model): ModelStats() for model in self.candidates}
+        return self
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-router"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"role": self.role, "models": [model_name(model) for model in self.candidates]}
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        # Формат OpenAI понимают все кандидаты; tools уходят в kwargs их generate/stream
+        if tool_choice is not None:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    # --- Публичный API: запуск роутера с заранее известным run_id (см. _ROUTER_RUN) ---
+    @staticmethod
+    def _bind_run(config):
+        config = ensure_config(config)
+        config["run_id"] = config.get("run_id") or uuid.uuid4()
+        return config, _ROUTER_RUN.set((config["run_id"], config))
+
+    def invoke(self, input, config=None, *, stop=None, **kwargs):
+        config, token = self._bind_run(config)
+        try:
+            return super().invoke(input, config, stop=stop, **kwargs)
+        finally:
+            _ROUTER_RUN.reset(token)
+
+    async def ainvoke(self, input, config=None, *, stop=None, **kwargs):
+        config, token = self._bind_run(config)
+        try:
+            return await super().ainvoke(input, config, stop=stop, **kwargs)
+        finally:
+            _ROUTER_RUN.reset(token)
+
+    def stream(self, input, config=None, *, stop=None, **kwargs):
+        config, token = self._bind_run(config)
+        iterator = super().stream(input, config, stop=stop, **kwargs)
+        try:
+            # Кандидат выбирается (с хеджем и failover) до первого чанка — только на это время нужен контекст
+            first = next(iterator, None)
+        finally:
+            _ROUTER_RUN.reset(token)
+        if first is not None:
+            yield first
+            yield from iterator
+
+    async def astream(self, input, config=None, *, stop=None, **kwargs):
+        config, token = self._bind_run(config)
+        iterator = super().astream(input, config, stop=stop, **kwargs)
+        try:
+            first = await anext(iterator, None)
+        finally:
+            _ROUTER_RUN.reset(token)
+        if first is None:
+            return
+        try:
+            yield first
+            async for chunk in iterator:
+                yield chunk
+        finally:
+            await iterator.aclose()
+
+    def stats_for(self, model) -> ModelStats:
+        return self._stats[model_name(model)]
+
+    def router_info(self) -> dict:
+        return {"role": self.role, "hedge": self.hedge,
+                "models": {name: stats.info() for name, stats in self._stats.items()}}
+
+    def _attempts(self) -> list:
+        """Кандидаты в порядке попыток; единственная модель может быть захеджирована сама собой."""
+        ranked = sorted(enumerate(self.candidates),
+                        key=lambda item: (self.stats_for(item[1]).cooling_down(), self.stats_for(item[1]).score(), item[0]))
+        order = [model for _, model in ranked]
+        if len(order) > 1 and random.random() < ROUTER_EXPLORE_RATE:
+            order[0], order[1] = order[1], order[0]
+        return order if len(order) > 1 else order * 2
+
+    def _hedge_delay(self, model, first_token: bool = False) -> Optional[float]:
+        """Через сколько секунд без ответа отправлять хедж (None — не хеджировать)."""
+        if not self.hedge:
+            return None
+        ms = self.stats_for(model).percentile(self.hedge_percentile, first_token)
+        if ms is None:
+            # По модели статистики еще мало — берем общую по роли
+            pooled = [x for stats in self._stats.values() for x in stats.samples(first_token)]
+            ms = percentile(pooled, self.hedge_percentile)
+        return max(ms if ms is not None else ROUTER_HEDGE_DEFAULT_MS, ROUTER_HEDGE_MIN_MS) / 1000
+
+    @staticmethod
+    def _call(model, messages, stop, callbacks, kwargs) -> ChatResult:
+        result = model.generate([messages], stop=stop, callbacks=callbacks, **kwargs)
+        return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+    @staticmethod
+    async def _acall(model, messages, stop, callbacks, kwargs) -> ChatResult:
+        result = await model.agenerate([messages], stop=stop, callbacks=callbacks, **kwargs)
+        return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+    @staticmethod
+    def _stream_chunks(model, messages, stop, callbacks, kwargs):
+        stream = model.stream(messages, config={"callbacks": callbacks}, stop=stop, **kwargs)
+        try:
+            for chunk in stream:
+                yield ChatGenerationChunk(message=chunk)
+        finally:
+            stream.close()
+
+    @staticmethod
+    async def _astream_chunks(model, messages, stop, callbacks, kwargs):
+        # Стрим кандидата закрываем явно вместе с оберткой (проигравший хедж, ранняя остановка)
+        stream = model.astream(messages, config={"callbacks": callbacks}, stop=stop, **kwargs)
+        try:
+            async for chunk in stream:
+                yield ChatGenerationChunk(message=chunk)
+        finally:
+            await stream.aclose()
+
+    def _annotate(self, message, model, hedged: bool, attempts: int):
+        message.response_metadata = {
+            **(message.response_metadata or {}),
+            "router": {"role": self.role, "model": model_name(model), "hedged": hedged, "attempts": attempts},
+        }
+
+    # --- invoke ---
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        attempts = self._attempts()
+        pending = {}  # future -> (модель, время старта, хедж ли)
+        launched, hedged_once, last_error = 0, False, None
+        deadline = None
+
+        def launch(hedged: bool):
+            nonlocal launched, deadline
+            model = attempts[launched]
+            launched += 1
+            self.stats_for(model).started(hedged)
+            future = ROUTER_POOL.submit(self._call, model, messages, stop, child_callbacks(run_manager), kwargs)
+            pending[future] = (model, time.perf_counter(), hedged)
+            if not hedged:
+                delay = self._hedge_delay(model)
+                deadline = time.perf_counter() + delay if delay is not None else None
+
+        launch(False)
+        while pending:
+            timeout = None
+            if not hedged_once and launched < len(attempts) and deadline is not None:
+                timeout = max(deadline - time.perf_counter(), 0)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged_once = True
+                launch(True)
+                continue
+            for future in done:
+                model, started, hedged = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.stats_for(model).failure(e)
+                    if not is_retryable(e):
+                        raise
+                    last_error = e
+                    print(f"🔀 [LLM ROUTER:{self.role}]: {model_name(model)} недоступна ({e.__class__.__name__}), переключаюсь")
+                    if not pending and launched < len(attempts):
+                        launch(False)
+                    continue
+                self.stats_for(model).success((time.perf_counter() - started) * 1000, won_hedge=hedged)
+                for other, (other_model, other_started, _) in pending.items():
+                    other.cancel()
+                    self.stats_for(other_model).cancelled((time.perf_counter() - other_started) * 1000)
+                self._annotate(result.generations[0].message, model, hedged, launched)
+                return result
+        raise last_error
+
+    # --- ainvoke ---
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        attempts = self._attempts()
+        pending = {}  # task -> (модель, время старта, хедж ли)
+        launched, hedged_once, last_error = 0, False, None
+        deadline = None
+
+        def launch(hedged: bool):
+            nonlocal launched, deadline
+            model = attempts[launched]
+            launched += 1
+            self.stats_for(model).started(hedged)
+            task = asyncio.ensure_future(self._acall(model, messages, stop, child_callbacks(run_manager), kwargs))
+            # Отмененный проигравший может успеть упасть с ошибкой — забираем ее, чтобы asyncio не ругался
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            pending[task] = (model, time.perf_counter(), hedged)
+            if not hedged:
+                delay = self._hedge_delay(model)
+                deadline = time.perf_counter() + delay if delay is not None else None
+
+        launch(False)
+        try:
+            while pending:
+                timeout = None
+                if not hedged_once and launched < len(attempts) and deadline is not None:
+                    timeout = max(deadline - time.perf_counter(), 0)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged_once = True
+                    launch(True)
+                    continue
+                for task in done:
+                    model, started, hedged = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self.stats_for(model).failure(e)
+                        if not is_retryable(e):
+                            raise
+                        last_error = e
+                        print(f"🔀 [LLM ROUTER:{self.role}]: {model_name(model)} недоступна ({e.__class__.__name__}), переключаюсь")
+                        if not pending and launched < len(attempts):
+                            launch(False)
+                        continue
+                    self.stats_for(model).success((time.perf_counter() - started) * 1000, won_hedge=hedged)
+                    self._annotate(result.generations[0].message, model, hedged, launched)
+                    return result
+            raise last_error
+        finally:
+            # Проигравший (или оставшийся после ошибки) запрос прерывается
+            for task, (model, started, _) in pending.items():
+                if task.done():
+                    continue  # Завершился в том же такте, что и победитель: результат не нужен
+                task.cancel()
+                self.stats_for(model).cancelled((time.perf_counter() - started) * 1000)
+
+    # --- stream ---
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        last_error = None
+        for attempt, model in enumerate(self._attempts(), start=1):
+            stats = self.stats_for(model)
+            stats.started(False)
+            started, first = time.perf_counter(), True
+            try:
+                for chunk in self._stream_chunks(model, messages, stop, child_callbacks(run_manager), kwargs):
+                    if first:
+                        stats.success((time.perf_counter() - started) * 1000, first_token=True)
+                        self._annotate(chunk.message, model, False, attempt)
+                        first = False
+                    yield chunk
+                return
+            except Exception as e:
+                stats.failure(e)
+                # После первого чанка переключаться поздно: часть ответа уже отдана
+                if not first or not is_retryable(e):
+                    raise
+                last_error = e
+                print(f"🔀 [LLM ROUTER:{self.role}]: {model_name(model)} недоступна ({e.__class__.__name__}), переключаюсь")
+        raise last_error
+
+    @staticmethod
+    async def _discard_stream(task, iterator):
+        # Прерывать __anext__ посреди чтения HTTP-потока нельзя (генераторы httpx остаются
+        # незакрытыми), поэтому проигравший стрим дожидается своего первого чанка и закрывается
+        try:
+            await task
+        except BaseException:
+            pass
+        try:
+            await iterator.aclose()
+        except Exception:
+            pass
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        """Хедж по времени до первого чанка: из стримов-участников продолжается тот, что ответил первым."""
+        attempts = self._attempts()
+        pending = {}  # task(первый чанк) -> (модель, итератор, время старта, хедж ли)
+        launched, hedged_once, last_error = 0, False, None
+        deadline = None
+
+        def launch(hedged: bool):
+            nonlocal launched, deadline
+            model = attempts[launched]
+            launched += 1
+            self.stats_for(model).started(hedged)
+            iterator = self._astream_chunks(model, messages, stop, child_callbacks(run_manager), kwargs)
+            pending[asyncio.ensure_future(iterator.__anext__())] = (model, iterator, time.perf_counter(), hedged)
+            if not hedged:
+                delay = self._hedge_delay(model, first_token=True)
+                deadline = time.perf_counter() + delay if delay is not None else None
+
+        launch(False)
+        winner = None
+        try:
+            while pending and winner is None:
+                timeout = None
+                if not hedged_once and launched < len(attempts) and deadline is not None:
+                    timeout = max(deadline - time.perf_counter(), 0)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged_once = True
+                    launch(True)
+                    continue
+                for task in done:
+                    model, iterator, started, hedged = pending.pop(task)
+                    if winner is not None:
+                        # Оба ответили в одном такте: второй стрим закрываем
+                        asyncio.ensure_future(self._discard_stream(task, iterator))
+                        continue
+                    try:
+                        first_chunk = task.result()
+                    except StopAsyncIteration:
+                        first_chunk = None
+                    except Exception as e:
+                        self.stats_for(model).failure(e)
+                        if not is_retryable(e):
+                            raise
+                        last_error = e
+                        print(f"🔀 [LLM ROUTER:{self.role}]: {model_name(model)} недоступна ({e.__class__.__name__}), переключаюсь")
+                        if not pending and launched < len(attempts):
+                            launch(False)
+                        continue
+                    self.stats_for(model).success((time.perf_counter() - started) * 1000, first_token=True,
+                                                  won_hedge=hedged)
+                    winner = (model, iterator, first_chunk, hedged)
+        finally:
+            for task, (model, iterator, started, _) in pending.items():
+                self.stats_for(model).cancelled((time.perf_counter() - started) * 1000, first_token=True)
+                asyncio.ensure_future(self._discard_stream(task, iterator))
+
+        if winner is None:
+            raise last_error
+        model, iterator, first_chunk, hedged = winner
+        if first_chunk is None:
+            return
+        self._annotate(first_chunk.message, model, hedged, launched)
+        try:
+            yield first_chunk
+            async for chunk in iterator:
+                yield chunk
+        except Exception as e:
+            self.stats_for(model).failure(e)
+            raise
+        finally:
+            # Потребитель мог остановиться раньше конца стрима — закрываем HTTP-поток явно
+            await iterator.aclose()
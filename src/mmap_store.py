@@ -0,0 +1,259 @@
+"""
+Компактный локальный векторный индекс на memory-mapped файлах (без qdrant_client).
+
+Структура папки MMAP_PATH:
+    meta.json      — размерность, тип хранения, число строк и емкость файла
+    vectors.bin    — матрица (capacity, dim) в float16 или int8 (нормированные векторы)
+    offsets.bin    — uint64 смещение строки payload в payloads.jsonl для каждой строки матрицы
+                     (максимальное значение uint64 — строка удалена)
+    payloads.jsonl — {"id": ..., "payload": {...}} по одной записи на строку
+
+Файлы отображаются в память через np.memmap, поэтому старт мгновенный (ничего не
+десериализуется), а страницы общие для всех воркеров, открывших тот же индекс.
+Payload читается с диска только для найденных top-k строк.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from src.lexical_index import matches_filters
+from src.vector_store import VectorManager, VECTOR_SIZE, SCORE_THRESHOLD
+
+MMAP_PATH = os.getenv("MMAP_INDEX_PATH", "./mmap_index")
+MMAP_DTYPE = os.getenv("MMAP_INDEX_DTYPE", "float16")  # "float16" или "int8"
+
+INT8_SCALE = 127.0
+# Матрица обрабатывается блоками, чтобы не создавать float32-копию всего индекса
+SEARCH_BLOCK_ROWS = 65536
+GROWTH_ROWS = 4096
+# Смещение-метка удаленной строки (tombstone)
+DELETED = np.uint64(2**64 - 1)
+
+
+class MmapVectorIndex:
+    """Хранилище нормированных векторов с точным top-k поиском по косинусу."""
+
+    def __init__(self, path: str, dim: int = VECTOR_SIZE, dtype: str = MMAP_DTYPE):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Неподдерживаемый тип хранения: {dtype}")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, "meta.json")
+        self._vectors_path = os.path.join(path, "vectors.bin")
+        self._offsets_path = os.path.join(path, "offsets.bin")
+        self._payloads_path = os.path.join(path, "payloads.jsonl")
+        self._lock = threading.RLock()
+        self._id_to_row = None  # Строится лениво, нужен только при записи
+
+        if os.path.exists(self._meta_path):
+            self._load_meta()
+        else:
+            self.meta = {"dim": dim, "dtype": dtype, "count": 0, "capacity": 0}
+            open(self._payloads_path, "ab").close()
+            self._resize(GROWTH_ROWS)
+            self._save_meta()
+        self._map()
+
+    # --- Файлы ---
+
+    def _load_meta(self):
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._meta_mtime = os.stat(self._meta_path).st_mtime_ns
+
+    def _save_meta(self):
+        tmp = f"{self._meta_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._meta_path)
+        self._meta_mtime = os.stat(self._meta_path).st_mtime_ns
+
+    @property
+    def dim(self) -> int:
+        return self.meta["dim"]
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    def _map(self):
+        capacity, dim = self.meta["capacity"], self.meta["dim"]
+        self.vectors = np.memmap(self._vectors_path, dtype=self.meta["dtype"], mode="r+", shape=(capacity, dim))
+        self.offsets = np.memmap(self._offsets_path, dtype=np.uint64, mode="r+", shape=(capacity,))
+
+    def _resize(self, capacity: int):
+        # Файлы растут через truncate без копирования уже записанных данных
+        itemsize = np.dtype(self.meta["dtype"]).itemsize
+        for file_path, row_bytes in ((self._vectors_path, self.meta["dim"] * itemsize), (self._offsets_path, 8)):
+            with open(file_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self.meta["capacity"] = capacity
+
+    def _maybe_reload(self):
+        # Другой процесс мог дописать индекс — подхватываем новую длину
+        try:
+            mtime = os.stat(self._meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._meta_mtime:
+            with self._lock:
+                self._load_meta()
+                self._map()
+                self._id_to_row = None
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        if self.meta["dtype"] == "int8":
+            return np.clip(np.round(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors.astype(np.float16)
+
+    def _read_payload(self, offset: int):
+        with open(self._payloads_path, "rb") as f:
+            f.seek(int(offset))
+            record = json.loads(f.readline())
+        return record["id"], record["payload"]
+
+    def _rows_by_id(self) -> dict:
+        if self._id_to_row is None:
+            mapping = {}
+            with open(self._payloads_path, "rb") as f:
+                for row in range(self.count):
+                    if self.offsets[row] == DELETED:
+                        continue
+                    f.seek(int(self.offsets[row]))
+                    mapping[json.loads(f.readline())["id"]] = row
+            self._id_to_row = mapping
+        return self._id_to_row
+
+    # --- Публичный интерфейс ---
+
+    def upsert(self, ids: list, vectors: list, payloads: list):
+        # search() идет без блокировки, поэтому порядок записи важен: сначала payload (с flush),
+        # затем векторы, затем смещения, и только в конце новый count — строка становится
+        # видимой поиску, когда все ее данные уже на месте
+        encoded = self._encode(vectors)
+        with self._lock:
+            self._maybe_reload()
+            rows_by_id = self._rows_by_id()
+            count = self.meta["count"]
+            new_rows, placements = {}, []
+            with open(self._payloads_path, "ab") as f:
+                for point_id, vector, payload in zip(ids, encoded, payloads):
+                    row = rows_by_id.get(point_id, new_rows.get(point_id))
+                    if row is None:
+                        row = new_rows[point_id] = count
+                        count += 1
+                    # Обновленный payload дописывается в конец, старая строка становится мусором
+                    placements.append((row, vector, f.tell()))
+                    f.write(json.dumps({"id": point_id, "payload": payload}, ensure_ascii=False).encode() + b"\n")
+
+            if count > self.meta["capacity"]:
+                self.vectors.flush()
+                self.offsets.flush()
+                capacity = max(self.meta["capacity"], GROWTH_ROWS)
+                while capacity < count:
+                    capacity *= 2
+                self._resize(capacity)
+                self._map()
+            for row, vector, _ in placements:
+                self.vectors[row] = vector
+            self.vectors.flush()
+            for row, _, offset in placements:
+                self.offsets[row] = offset
+            self.offsets.flush()
+            self.meta["count"] = count
+            rows_by_id.update(new_rows)
+            self._save_meta()
+
+    def delete(self, ids: list):
+        with self._lock:
+            self._maybe_reload()
+            rows_by_id = self._rows_by_id()
+            for point_id in ids:
+                row = rows_by_id.pop(point_id, None)
+                if row is not None:
+                    self.vectors[row] = 0
+                    self.offsets[row] = DELETED
+            self.vectors.flush()
+            self.offsets.flush()
+            self._save_meta()
+
+    def scores(self, query: list, count: int = None, vectors: np.ndarray = None) -> np.ndarray:
+        """Косинусное сходство запроса с первыми count строками индекса (по умолчанию — со всеми)."""
+        q = np.asarray(query, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        count = self.count if count is None else count
+        vectors = self.vectors if vectors is None else vectors
+        result = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:min(start + SEARCH_BLOCK_ROWS, count)], dtype=np.float32)
+            result[start:start + len(block)] = block @ q
+        if self.meta["dtype"] == "int8":
+            result /= INT8_SCALE
+        return result
+
+    def search(self, query: list, limit: int, filters: dict = None, score_threshold: float = None):
+        """Возвращает список (id, score, payload) по убыванию сходства."""
+        self._maybe_reload()
+        # Снимок без блокировки: upsert публикует count последним, строки до него уже дописаны
+        count, vectors, offsets = self.count, self.vectors, self.offsets
+        if not count:
+            return []
+        scores = self.scores(query, count, vectors)
+        threshold = SCORE_THRESHOLD if score_threshold is None else score_threshold
+        # При фильтрах payload проверяется после ранжирования: начинаем с запаса кандидатов
+        # и расширяем выборку, пока не наберется limit совпадений или не кончатся строки
+        k = min(count, limit * 20 if filters else limit)
+        results, checked = [], set()
+        while True:
+            top = np.argpartition(-scores, k - 1)[:k]
+            for row in top[np.argsort(-scores[top])]:
+                if row in checked:
+                    continue
+                checked.add(row)
+                score = float(scores[row])
+                if score <= threshold:
+                    return results
+                offset = offsets[row]
+                if offset == DELETED:
+                    continue
+                point_id, payload = self._read_payload(offset)
+                if matches_filters(payload, filters):
+                    results.append((point_id, score, payload))
+                    if len(results) >= limit:
+                        return results
+            if k >= count:
+                return results
+            k = min(count, k * 4)
+
+    def iter_payloads(self):
+        self._maybe_reload()
+        for row in range(self.count):
+            if self.offsets[row] != DELETED:
+                yield self._read_payload(self.offsets[row])
+
+
+class MmapVectorManager(VectorManager):
+    """VectorManager с хранением векторов в MmapVectorIndex вместо Qdrant."""
+
+    def _init_store(self):
+        self.index = MmapVectorIndex(MMAP_PATH, dim=VECTOR_SIZE, dtype=MMAP_DTYPE)
+
+    def _iter_payloads(self):
+        return self.index.iter_payloads()
+
+    def _vector_search_by_vector(self, vector: list, limit: int, filters: dict = None,
+                                 score_threshold: float = None, ef: int = None):
+        # ef не используется: поиск точный (полный перебор блоками + argpartition)
+        return [(point_id, payload) for point_id, _, payload
+                in self.index.search(vector, limit, filters, score_threshold)]
+
+    def _upsert(self, ids: list, vectors: list, payloads: list):
+        self.index.upsert(ids, vectors, payloads)
+
+    def _delete(self, ids: list):
+        self.index.delete(ids)
@@ -0,0 +1,132 @@
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+import time
+
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", "300"))
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "256"))
+SQL_CACHE_MAX_ROWS = int(os.getenv("SQL_CACHE_MAX_ROWS", "200000"))
+
+# Строковые литералы и идентификаторы в кавычках не трогаем при нормализации
+_QUOTED_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_WS_RE = re.compile(r"\s+")
+# Пробелы вокруг операторов и скобок не влияют на смысл запроса
+_PUNCT_RE = re.compile(r"\s*([=<>(),;+*/-])\s*")
+_TABLE_RE = re.compile(r"\b(?:from|join)\s+((?:\"[^\"]+\"|[a-z_][\w$]*)(?:\.(?:\"[^\"]+\"|[a-z_][\w$]*))?)")
+
+
+def normalize_sql(query: str) -> str:
+    """Убирает комментарии, лишние пробелы, регистр ключевых слов и завершающую ';'."""
+    parts = _QUOTED_RE.split(query)
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            normalized.append(part)  # Литерал в кавычках — как есть
+        else:
+            part = _WS_RE.sub(" ", _COMMENT_RE.sub(" ", part).lower())
+            normalized.append(_PUNCT_RE.sub(r"\1", part))
+    return "".join(normalized).strip().rstrip(";").strip()
+
+
+def extract_tables(query: str) -> set:
+    """Имена таблиц после FROM/JOIN (без схемы), для инвалидации по таблице."""
+    tables = set()
+    for name in _TABLE_RE.findall(normalize_sql(query)):
+        tables.add(name.split(".")[-1].strip('"'))
+    return tables
+
+
+class QueryResultCache:
+    """
+    Кэш результатов SELECT-запросов: ключ — нормализованный SQL + параметры.
+    Записи живут ttl секунд; при превышении max_entries или суммарно max_rows строк
+    вытесняются давно не использованные (LRU). Можно сбросить записи по таблице.
+    """
+    def __init__(self, ttl: float = SQL_CACHE_TTL, max_entries: int = SQL_CACHE_MAX_ENTRIES,
+                 max_rows: int = SQL_CACHE_MAX_ROWS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = OrderedDict()  # key -> {"value", "rows", "tables", "expires"}
+        self._total_rows = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(query: str, params=None) -> str:
+        return hashlib.sha256(f"{normalize_sql(query)}\x00{params!r}".encode()).hexdigest()
+
+    def _drop(self, key: str):
+        # Вызывается под self._lock
+        entry = self._entries.pop(key)
+        self._total_rows -= entry["rows"]
+
+    def get(self, query: str, params=None):
+        key = self.make_key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry["expires"] < time.monotonic():
+                self._drop(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry["value"]
+
+    def put(self, query: str, value, rows: int = 1, params=None):
+        """rows — "вес" записи (число строк результата) для ограничения по размеру."""
+        if rows > self.max_rows:
+            return
+        key = self.make_key(query, params)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "value": value,
+                "rows": rows,
+                "tables": extract_tables(query),
+                "expires": time.monotonic() + self.ttl,
+            }
+            self._total_rows += rows
+            while len(self._entries) > self.max_entries or self._total_rows > self.max_rows:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate_table(self, table: str) -> int:
+        table = table.lower().split(".")[-1].strip('"')
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if table in e["tables"]]
+            for key in keys:
+                self._drop(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_rows = 0
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "rows": self._total_rows,
+                "hit_rate": round(self.stats["hits"] / total, 3) if total else 0.0,
+            }
+
+
+query_cache = QueryResultCache()
+
+
+def store_query_result(query: str, rows: list, truncated: bool = False):
+    """Сохраняет результат execute_sql в кэш запросов."""
+    query_cache.put(query, (rows, truncated), rows=max(len(rows), 1))
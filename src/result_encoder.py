@@ -0,0 +1,94 @@
+from datetime import date, datetime
+from decimal import Decimal
+import csv
+import io
+import math
+import os
+
+from src.token_counter import count_tokens
+
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "1500"))
+# Запас бюджета под строку итога и статистику по колонкам
+SUMMARY_RESERVE = 0.25
+
+
+def format_value(value) -> str:
+    """Компактное представление значения: числа без лишних нулей, даты в ISO."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (float, Decimal)):
+        if not math.isfinite(value):
+            return str(value)
+        if value == int(value) and abs(value) < 1e15:
+            return str(int(value))
+        return f"{float(value):.4f}".rstrip("0").rstrip(".")
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0).isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_line(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(values)
+    return buffer.getvalue()
+
+
+def column_stats(rows: list, columns: list) -> list:
+    """Строки вида 'salary: min=.. max=.. mean=..' для числовых колонок."""
+    lines = []
+    for column in columns:
+        values = [row[column] for row in rows
+                  if isinstance(row.get(column), (int, float, Decimal)) and not isinstance(row.get(column), bool)]
+        if not values:
+            continue
+        mean = sum(float(v) for v in values) / len(values)
+        lines.append(f"{column}: min={format_value(min(values))} max={format_value(max(values))} "
+                     f"mean={format_value(mean)}")
+    return lines
+
+
+def encode_rows(rows: list, token_budget: int = TOOL_RESULT_TOKEN_BUDGET, total_rows: int = None,
+                stats_rows: list = None, footer: str = None) -> str:
+    """
+    Кодирует список словарей в CSV-подобный текст: заголовок один раз, затем строки.
+    Строки добавляются, пока помещаются в token_budget; если показаны не все строки
+    (обрезка по бюджету или постраничная выдача), добавляется итог с числом строк
+    и min/max/mean по числовым колонкам, посчитанными по stats_rows (по умолчанию rows).
+    """
+    if not rows:
+        return "Запрос выполнен успешно, но данных не найдено."
+    columns = list(rows[0].keys())
+    total_rows = total_rows if total_rows is not None else len(rows)
+    stats_rows = stats_rows if stats_rows is not None else rows
+
+    lines = [_csv_line(columns)]
+    used = count_tokens(lines[0])
+    row_budget = token_budget if total_rows == len(rows) else int(token_budget * (1 - SUMMARY_RESERVE))
+    for row in rows:
+        line = _csv_line([format_value(row.get(column)) for column in columns])
+        cost = count_tokens(line) + 1
+        if used + cost > row_budget:
+            # Не поместились все строки — дальше нужен итог, освобождаем под него место
+            row_budget = int(token_budget * (1 - SUMMARY_RESERVE))
+            while len(lines) > 2 and used > row_budget:
+                used -= count_tokens(lines.pop()) + 1
+            break
+        lines.append(line)
+        used += cost
+
+    shown = len(lines) - 1
+    if shown < total_rows:
+        lines.append(f"... показано {shown} из {total_rows} строк")
+        stats = column_stats(stats_rows, columns)
+        if stats:
+            lines.append("Статистика по числовым колонкам:")
+            lines.extend(stats)
+    if footer:
+        lines.append(footer)
+    return "\n".join(lines)
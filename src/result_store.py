@@ -0,0 +1,75 @@
+from collections import OrderedDict
+import math
+import os
+import threading
+import time
+import uuid
+
+SQL_PAGE_SIZE = int(os.getenv("SQL_PAGE_SIZE", "50"))
+RESULT_HANDLE_TTL = float(os.getenv("SQL_RESULT_TTL", "1800"))
+RESULT_MAX_HANDLES = int(os.getenv("SQL_RESULT_MAX_HANDLES", "100"))
+
+
+class ResultStore:
+    """
+    Хранилище результатов execute_sql для постраничной выдачи.
+    Результат уже ограничен SQL_ROW_CAP строками, а число хранимых результатов —
+    max_handles (LRU) и ttl, поэтому расход памяти ограничен сверху.
+    """
+    def __init__(self, page_size: int = SQL_PAGE_SIZE, ttl: float = RESULT_HANDLE_TTL,
+                 max_handles: int = RESULT_MAX_HANDLES):
+        self.page_size = page_size
+        self.ttl = ttl
+        self.max_handles = max_handles
+        self._results = OrderedDict()  # handle -> {"rows", "truncated", "query", "created"}
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        # Вызывается под self._lock
+        now = time.monotonic()
+        for handle in [h for h, r in self._results.items() if now - r["created"] > self.ttl]:
+            del self._results[handle]
+        while len(self._results) > self.max_handles:
+            self._results.popitem(last=False)
+
+    def put(self, query: str, rows: list, truncated: bool) -> str:
+        handle = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._results[handle] = {"rows": rows, "truncated": truncated, "query": query,
+                                     "created": time.monotonic()}
+            self._evict()
+        return handle
+
+    def page(self, handle: str, page: int = 1, include_all_rows: bool = False) -> dict:
+        """
+        Страница результата (нумерация с 1) или None, если handle неизвестен/истек.
+        include_all_rows — добавить в ответ все строки ("all_rows") для статистики по всему результату.
+        """
+        with self._lock:
+            self._evict()
+            result = self._results.get(handle)
+            if result is None:
+                return None
+            self._results.move_to_end(handle)
+        result_page = make_page(result["rows"], page, self.page_size, handle, result["truncated"])
+        if include_all_rows:
+            result_page["all_rows"] = result["rows"]
+        return result_page
+
+
+def make_page(rows: list, page: int, page_size: int, handle: str = None, truncated: bool = False) -> dict:
+    total_pages = max(math.ceil(len(rows) / page_size), 1)
+    page = min(max(page, 1), total_pages)
+    start = (page - 1) * page_size
+    return {
+        "rows": rows[start:start + page_size],
+        "page": page,
+        "total_pages": total_pages,
+        "rows_total": len(rows),
+        # truncated: в базе есть еще строки сверх лимита SQL_ROW_CAP
+        "truncated": truncated,
+        "handle": handle,
+    }
+
+
+result_store = ResultStore()
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+import time
+
+from src.db_pool import get_pg_pool
+from src.async_db import get_async_pg_pool
+
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SCHEMA_CACHE_CHECK_INTERVAL", "30"))
+
+# Отпечаток каталога: меняется при создании/удалении/переименовании таблиц и колонок,
+# смене типа колонки, комментария таблицы/колонки или набора внешних ключей — от него
+# зависят и кэш схемы, и индекс релевантности (src/schema_index.py) с расширением по FK.
+# Читает только pg_class/pg_attribute/pg_description/pg_constraint — на порядки дешевле
+# information_schema.columns на широких схемах.
+FINGERPRINT_SQL = """
+SELECT md5(
+    coalesce((
+        SELECT string_agg(
+                   c.oid::text || ':' || c.relname || ':' || a.attnum || ':' || a.attname || ':'
+                   || a.atttypid::text || ':' || a.atttypmod::text || ':'
+                   || coalesce(col_description(c.oid, a.attnum), ''),
+                   ',' ORDER BY c.oid, a.attnum)
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+        WHERE n.nspname = 'public'
+          AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+    ), '')
+    || '|' || coalesce((
+        SELECT string_agg(c.oid::text || ':' || obj_description(c.oid, 'pg_class'), ',' ORDER BY c.oid)
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+          AND obj_description(c.oid, 'pg_class') IS NOT NULL
+    ), '')
+    || '|' || coalesce((
+        SELECT string_agg(
+                   con.conrelid::text || ':' || con.conkey::text || '->'
+                   || con.confrelid::text || ':' || con.confkey::text,
+                   ',' ORDER BY con.conrelid, con.conkey::text, con.confrelid, con.confkey::text)
+        FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+        WHERE con.contype = 'f' AND n.nspname = 'public'
+    ), '')
+);
+"""
+
+COLUMNS_SQL = """
+SELECT table_name, column_name, data_type
+FROM information_schema.columns
+WHERE table_schema = 'public'
+ORDER BY table_name, ordinal_position;
+"""
+
+
+def render_schema(tables: dict) -> str:
+    if not tables:
+        return "База данных пуста или таблицы находятся не в схеме 'public'."
+    schema_info = []
+    for table, columns in tables.items():
+        columns_text = ", ".join(f"{column} ({dtype})" for column, dtype in columns)
+        schema_info.append(f"Таблица: {table}\nКолонки: {columns_text} ")
+    return "\n\n".join(schema_info)
+
+
+def database_key() -> str:
+    return f"{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'postgres')}"
+
+
+class SchemaCache:
+    """
+    Кэш отрендеренной схемы по базам данных.
+    Не чаще раза в check_interval секунд сверяет отпечаток каталога и
+    перечитывает information_schema только если схема действительно изменилась.
+    """
+    def __init__(self, check_interval: float = SCHEMA_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._entries = {}  # db_key -> {"fingerprint", "checked_at", "tables", "text"}
+        # Короткая блокировка только на чтение/замену записей в памяти — никогда не держится
+        # во время запросов к БД, поэтому event loop может брать ее без риска зависнуть
+        self._lock = threading.Lock()
+        # Одна проверка каталога на все ожидающие потоки (синхронный путь, event loop ее не берет)
+        self._refresh_lock = threading.Lock()
+        # Для асинхронного пути: одна проверка каталога на все ожидающие корутины
+        self._async_lock = asyncio.Lock()
+        self.stats = {"hits": 0, "fingerprint_checks": 0, "reloads": 0}
+
+    def get(self) -> dict:
+        key = database_key()
+        with self._lock:
+            entry = self._fresh_entry(key)
+        if entry:
+            return entry
+
+        # Параллельные запросы не устраивают "лавину" одинаковых запросов к каталогу
+        with self._refresh_lock:
+            # Пока ждали блокировку, каталог мог проверить другой поток
+            with self._lock:
+                fresh, entry = self._fresh_entry(key), self._entries.get(key)
+            if fresh:
+                return fresh
+
+            with get_pg_pool().connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(FINGERPRINT_SQL)
+                    fingerprint = cursor.fetchone()[0]
+                    if entry and entry["fingerprint"] == fingerprint:
+                        return self._touch(entry)
+
+                    cursor.execute(COLUMNS_SQL)
+                    rows = cursor.fetchall()
+
+            return self._store(key, self._build_entry(fingerprint, rows))
+
+    def _touch(self, entry: dict) -> dict:
+        # Схема не изменилась: только продлеваем свежесть записи
+        with self._lock:
+            self.stats["fingerprint_checks"] += 1
+            entry["checked_at"] = time.monotonic()
+        return entry
+
+    def _store(self, key: str, entry: dict) -> dict:
+        with self._lock:
+            self.stats["fingerprint_checks"] += 1
+            self.stats["reloads"] += 1
+            self._entries[key] = entry
+        return entry
+
+    def _fresh_entry(self, key: str):
+        # Вызывается под self._lock
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry["checked_at"] < self.check_interval:
+            self.stats["hits"] += 1
+            return entry
+        return None
+
+    @staticmethod
+    def _build_entry(fingerprint: str, rows: list) -> dict:
+        tables = {}
+        for table, column, dtype in rows:
+            tables.setdefault(table, []).append((column, dtype))
+        return {
+            "fingerprint": fingerprint,
+            "checked_at": time.monotonic(),
+            "tables": tables,
+            "text": render_schema(tables),
+        }
+
+    async def aget(self) -> dict:
+        """Асинхронный get через пул psycopg 3 (не блокирует event loop)."""
+        key = database_key()
+        with self._lock:
+            entry = self._fresh_entry(key)
+        if entry:
+            return entry
+
+        async with self._async_lock:
+            # Пока ждали блокировку, каталог могла проверить другая корутина
+            with self._lock:
+                fresh, entry = self._fresh_entry(key), self._entries.get(key)
+            if fresh:
+                return fresh
+
+            pool = await get_async_pg_pool()
+            async with pool.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(FINGERPRINT_SQL)
+                    fingerprint = (await cursor.fetchone())[0]
+                    if entry and entry["fingerprint"] == fingerprint:
+                        return self._touch(entry)
+
+                    await cursor.execute(COLUMNS_SQL)
+                    rows = await cursor.fetchall()
+
+            return self._store(key, self._build_entry(fingerprint, rows))
+
+    async def aget_text(self) -> str:
+        return (await self.aget())["text"]
+
+    def get_text(self) -> str:
+        return self.get()["text"]
+
+    def get_tables(self) -> dict:
+        """Структурированная схема: {таблица: [(колонка, тип), ...]}."""
+        return self.get()["tables"]
+
+    def fingerprint(self) -> str:
+        return self.get()["fingerprint"]
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.pop(database_key(), None)
+
+
+schema_cache = SchemaCache()
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from src.db_pool import get_pg_pool
+from src.schema_cache import schema_cache
+
+# Сколько наиболее похожих на вопрос таблиц возвращать и сколько соседей по FK добавлять
+SCHEMA_INDEX_TOP_K = int(os.getenv("SCHEMA_INDEX_TOP_K", "5"))
+SCHEMA_INDEX_MAX_NEIGHBOURS = int(os.getenv("SCHEMA_INDEX_MAX_NEIGHBOURS", "5"))
+# На маленькой схеме отбор не нужен — отдаем ее целиком
+SCHEMA_INDEX_MIN_TABLES = int(os.getenv("SCHEMA_INDEX_MIN_TABLES", "20"))
+
+# Колонки с типами и комментариями таблиц/колонок
+CATALOG_SQL = """
+SELECT c.relname, obj_description(c.oid, 'pg_class'),
+       a.attname, format_type(a.atttypid, a.atttypmod), col_description(c.oid, a.attnum)
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+WHERE n.nspname = 'public'
+  AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+  AND a.attnum > 0
+  AND NOT a.attisdropped
+ORDER BY c.relname, a.attnum;
+"""
+
+# Внешние ключи: (таблица, колонка) -> (таблица, колонка)
+FOREIGN_KEYS_SQL = """
+SELECT src.relname, sa.attname, dst.relname, da.attname
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+JOIN pg_catalog.pg_class src ON src.oid = con.conrelid
+JOIN pg_catalog.pg_class dst ON dst.oid = con.confrelid
+CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum)
+JOIN pg_catalog.pg_attribute sa ON sa.attrelid = con.conrelid AND sa.attnum = k.attnum
+JOIN pg_catalog.pg_attribute da ON da.attrelid = con.confrelid AND da.attnum = k.fattnum
+WHERE con.contype = 'f' AND n.nspname = 'public';
+"""
+
+
+def load_catalog(cursor) -> dict:
+    """{таблица: {"comment", "columns": [(колонка, тип, комментарий)], "fks": [(колонка, таблица, колонка)]}}"""
+    cursor.execute(CATALOG_SQL)
+    tables = {}
+    for table, table_comment, column, dtype, column_comment in cursor.fetchall():
+        entry = tables.setdefault(table, {"comment": table_comment, "columns": [], "fks": []})
+        entry["columns"].append((column, dtype, column_comment))
+    cursor.execute(FOREIGN_KEYS_SQL)
+    for table, column, ref_table, ref_column in cursor.fetchall():
+        if table in tables:
+            tables[table]["fks"].append((column, ref_table, ref_column))
+    return tables
+
+
+def describe_table(name: str, table: dict) -> str:
+    """Текст таблицы для эмбеддинга и для промпта."""
+    lines = [f"Таблица: {name}" + (f" — {table['comment']}" if table["comment"] else "")]
+    columns = []
+    for column, dtype, comment in table["columns"]:
+        columns.append(f"{column} ({dtype})" + (f" — {comment}" if comment else ""))
+    lines.append("Колонки: " + ", ".join(columns))
+    if table["fks"]:
+        lines.append("Связи: " + ", ".join(f"{c} -> {t}.{rc}" for c, t, rc in table["fks"]))
+    return "\n".join(lines)
+
+
+class SchemaIndex:
+    """
+    Векторный индекс описаний таблиц (колонки, комментарии, внешние ключи).
+    Описания эмбеддятся один раз; при смене отпечатка схемы (schema_cache.fingerprint)
+    пересчитываются только таблицы, чье описание изменилось, удаленные — выбрасываются.
+    По вопросу возвращает top_k похожих таблиц и их соседей по внешним ключам.
+    """
+    def __init__(self, embeddings=None, top_k: int = SCHEMA_INDEX_TOP_K,
+                 max_neighbours: int = SCHEMA_INDEX_MAX_NEIGHBOURS):
+        self._embeddings = embeddings
+        self.top_k = top_k
+        self.max_neighbours = max_neighbours
+        self._fingerprint = None
+        self._tables = {}      # таблица -> описание из load_catalog
+        self._docs = {}        # таблица -> (hash описания, текст)
+        self._names = []       # порядок строк матрицы
+        self._matrix = None    # нормированные эмбеддинги таблиц
+        self._lock = threading.Lock()          # Только чтение/подмена готового индекса
+        self._refresh_lock = threading.Lock()  # Перестройка (каталог + эмбеддинги)
+        self.stats = {"refreshes": 0, "tables_embedded": 0, "tables_removed": 0, "searches": 0}
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            # Та же модель и тот же кэш эмбеддингов, что у базы знаний
+            from src.vector_store import get_vector_db
+            self._embeddings = get_vector_db().embeddings
+        return self._embeddings
+
+    def refresh(self):
+        fingerprint = schema_cache.fingerprint()
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return
+        # Каталог и эмбеддинги строятся вне self._lock: search по старому индексу не ждет их.
+        # _refresh_lock — одна перестройка на все потоки, увидевшие новый отпечаток
+        with self._refresh_lock:
+            with self._lock:
+                if fingerprint == self._fingerprint:
+                    return
+                old_names, old_matrix, old_docs = self._names, self._matrix, self._docs
+
+            with get_pg_pool().connection() as conn:
+                with conn.cursor() as cursor:
+                    tables = load_catalog(cursor)
+
+            docs = {}
+            for name, table in tables.items():
+                text = describe_table(name, table)
+                docs[name] = (hashlib.sha256(text.encode()).hexdigest(), text)
+
+            vectors = {}
+            if old_matrix is not None:
+                for i, name in enumerate(old_names):
+                    if name in docs and docs[name][0] == old_docs[name][0]:
+                        vectors[name] = old_matrix[i]
+            changed = [name for name in docs if name not in vectors]
+            if changed:
+                computed = self.embeddings.embed_documents([docs[name][1] for name in changed])
+                for name, vector in zip(changed, computed):
+                    vector = np.asarray(vector, dtype=np.float32)
+                    vectors[name] = vector / (np.linalg.norm(vector) or 1.0)
+            names = sorted(docs)
+            matrix = np.vstack([vectors[n] for n in names]) if names else None
+
+            with self._lock:
+                self.stats["tables_embedded"] += len(changed)
+                self.stats["tables_removed"] += len(set(old_docs) - set(docs))
+                self.stats["refreshes"] += 1
+                self._names, self._matrix = names, matrix
+                self._tables, self._docs, self._fingerprint = tables, docs, fingerprint
+
+    def _neighbours(self, names: list) -> list:
+        # Вызывается под self._lock: таблицы, связанные FK с найденными (в обе стороны)
+        selected, result = set(names), []
+        for name in names:
+            linked = [t for _, t, _ in self._tables[name]["fks"]]
+            linked += [other for other, table in self._tables.items()
+                       if any(t == name for _, t, _ in table["fks"])]
+            for table in linked:
+                if table not in selected and table in self._tables:
+                    selected.add(table)
+                    result.append(table)
+        return result[:self.max_neighbours]
+
+    def search(self, question: str, top_k: int = None) -> dict:
+        """{"tables": [...], "neighbours": [...], "total_tables": N, "text": схема для промпта}"""
+        self.refresh()
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            self.stats["searches"] += 1
+            if self._matrix is None:
+                return {"tables": [], "neighbours": [], "total_tables": 0, "text": ""}
+            scores = self._matrix @ query
+            order = np.argsort(-scores)[:top_k or self.top_k]
+            tables = [self._names[i] for i in order]
+            neighbours = self._neighbours(tables)
+            text = "\n\n".join(self._docs[name][1] for name in tables + neighbours)
+            return {"tables": tables, "neighbours": neighbours, "total_tables": len(self._names), "text": text}
+
+    def info(self) -> dict:
+        with self._lock:
+            return {**self.stats, "tables": len(self._names)}
+
+
+schema_index = SchemaIndex()
@@ -0,0 +1,173 @@
+"""
+Семантический кэш "вопрос -> SQL".
+
+Вопросы, по которым SQL был подтвержден пользователем и успешно выполнен,
+сохраняются вместе с эмбеддингом и отпечатком схемы. Новый вопрос, похожий
+на сохраненный (косинус >= threshold), получает готовый SQL без генерации LLM —
+но все равно проходит инспекцию и подтверждение пользователем.
+"""
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from src.embedding_cache import normalize_text
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+# Короткие ответы пользователя на предложение выполнить SQL — это не новые вопросы
+CONFIRMATION_WORDS = {
+    "да", "ок", "ok", "okay", "yes", "y", "ага", "угу", "давай", "выполняй", "выполни",
+    "подтверждаю", "запускай", "нет", "no", "отмена", "не надо",
+}
+# Начала уточняющих вопросов ("а за 2023 год?"): без предыдущего вопроса они не имеют смысла
+FOLLOW_UP_PREFIXES = (
+    "а", "и", "но", "тогда", "теперь", "также", "еще", "ещё", "то же", "тоже", "так же",
+    "а если", "а что", "а как", "what about", "and", "also", "same",
+)
+# Вопрос короче стольких слов считается уточнением предыдущего
+FOLLOW_UP_MAX_WORDS = int(os.getenv("SEMANTIC_CACHE_FOLLOW_UP_MAX_WORDS", "3"))
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def is_confirmation(text: str) -> bool:
+    words = _PUNCT_RE.sub(" ", text.lower()).split()
+    if not words:
+        return False
+    return " ".join(words) in CONFIRMATION_WORDS or (len(words) <= 3 and all(w in CONFIRMATION_WORDS for w in words))
+
+
+def is_follow_up(text: str) -> bool:
+    """Уточнение к предыдущему вопросу: начинается с "а"/"и"/"тогда"... или слишком короткое."""
+    words = _PUNCT_RE.sub(" ", text.lower()).split()
+    if not words:
+        return False
+    phrase = " ".join(words)
+    return len(words) <= FOLLOW_UP_MAX_WORDS or any(
+        phrase == prefix or phrase.startswith(prefix + " ") for prefix in FOLLOW_UP_PREFIXES
+    )
+
+
+def contextual_question(text: str, previous: str = None) -> str:
+    """
+    Текст, под которым вопрос ищется и сохраняется в кэше. Уточнение склеивается
+    с предыдущим вопросом диалога: иначе "а за 2023 год?" из одного разговора
+    совпало бы с тем же уточнением к совсем другому вопросу.
+    """
+    if previous and is_follow_up(text):
+        return f"{previous}\n{text}"
+    return text
+
+
+class SemanticQueryCache:
+    """
+    Записи: вопрос, SQL, отпечаток схемы, нормированный эмбеддинг вопроса и оценка
+    времени генерации (сколько LLM-времени ушло на вывод этого SQL).
+    Записи с устаревшим отпечатком схемы удаляются при поиске.
+    """
+    def __init__(self, embeddings=None, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self._embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = []    # {"question", "sql", "fingerprint", "generation_ms", "hits", "used_at"}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stale_dropped": 0, "stored": 0,
+                      "lookup_ms_total": 0.0, "saved_ms_total": 0.0}
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            # Та же модель и тот же кэш эмбеддингов, что у базы знаний
+            from src.vector_store import get_vector_db
+            self._embeddings = get_vector_db().embeddings
+        return self._embeddings
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(normalize_text(question)), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _drop_stale(self, fingerprint: str):
+        # Вызывается под self._lock
+        keep = [i for i, entry in enumerate(self._entries) if entry["fingerprint"] == fingerprint]
+        if len(keep) != len(self._entries):
+            self.stats["stale_dropped"] += len(self._entries) - len(keep)
+            self._entries = [self._entries[i] for i in keep]
+            self._matrix = self._matrix[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+    def _best(self, vector: np.ndarray):
+        # Вызывается под self._lock: (индекс, сходство) лучшей записи или (None, 0.0)
+        if not self._entries:
+            return None, 0.0
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def lookup(self, question: str, fingerprint: str):
+        """Запись с похожим вопросом ({"question", "sql", "similarity", ...}) или None."""
+        started = time.perf_counter()
+        vector = self._embed(question)
+        with self._lock:
+            self._drop_stale(fingerprint)
+            best, similarity = self._best(vector)
+            lookup_ms = (time.perf_counter() - started) * 1000
+            self.stats["lookups"] += 1
+            self.stats["lookup_ms_total"] += lookup_ms
+            if best is None or similarity < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            entry = self._entries[best]
+            entry["hits"] += 1
+            entry["used_at"] = time.time()
+            self.stats["hits"] += 1
+            self.stats["saved_ms_total"] += max(entry["generation_ms"] - lookup_ms, 0.0)
+            return {**entry, "similarity": similarity}
+
+    def store(self, question: str, sql: str, fingerprint: str, generation_ms: float = 0.0):
+        vector = self._embed(question)
+        with self._lock:
+            self._drop_stale(fingerprint)
+            best, similarity = self._best(vector)
+            if best is not None and similarity >= self.threshold and self._entries[best]["sql"] == sql:
+                # Тот же вопрос (например, повторно выполненный из кэша): обновляем, не дублируем
+                entry = self._entries[best]
+                entry["generation_ms"] = max(entry["generation_ms"], generation_ms)
+                entry["used_at"] = time.time()
+                return
+            self._entries.append({"question": question, "sql": sql, "fingerprint": fingerprint,
+                                  "generation_ms": generation_ms, "hits": 0, "used_at": time.time()})
+            self._matrix = np.vstack([self._matrix, vector]) if self._matrix.size else vector[None, :]
+            self.stats["stored"] += 1
+            if len(self._entries) > self.max_entries:
+                # Вытесняем давно не использованную запись
+                oldest = min(range(len(self._entries)), key=lambda i: self._entries[i]["used_at"])
+                del self._entries[oldest]
+                self._matrix = np.delete(self._matrix, oldest, axis=0)
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            lookups = self.stats["lookups"]
+            return {
+                "entries": len(self._entries),
+                "lookups": lookups,
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "stale_dropped": self.stats["stale_dropped"],
+                "stored": self.stats["stored"],
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "avg_lookup_ms": round(self.stats["lookup_ms_total"] / lookups, 3) if lookups else 0.0,
+                "saved_ms_total": round(self.stats["saved_ms_total"], 1),
+            }
+
+
+semantic_cache = SemanticQueryCache()
@@ -0,0 +1,147 @@
+import json
+import os
+
+from src.db_pool import get_pg_pool
+
+try:
+    import sqlglot
+    from sqlglot.errors import ParseError
+except ImportError:  # sqlglot — необязательная зависимость
+    sqlglot = None
+
+# Пороги для оценок планировщика (EXPLAIN без ANALYZE — запрос не выполняется)
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "1000000"))
+SQL_MAX_PLAN_ROWS = float(os.getenv("SQL_MAX_PLAN_ROWS", "1000000"))
+# Seq Scan по таблице больше этого числа строк считается дорогим
+SQL_SEQSCAN_MAX_TABLE_ROWS = float(os.getenv("SQL_SEQSCAN_MAX_TABLE_ROWS", "100000"))
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+TIMEOUT_SQL = "SELECT set_config('statement_timeout', %s, true)"
+TABLE_ROWS_SQL = "SELECT relname, reltuples FROM pg_catalog.pg_class WHERE relname = ANY(%s)"
+
+
+class MultipleStatementsError(ValueError):
+    """В строке запроса не ровно один SQL-оператор."""
+
+
+def ensure_single_statement(query: str):
+    """
+    Бросает MultipleStatementsError, если query — не ровно один SQL-оператор.
+    Драйвер выполняет строку с несколькими операторами целиком (simple query protocol):
+    "SELECT 1; COMMIT; DROP ..." завершил бы транзакцию и выполнил DROP.
+    Без sqlglot допускается только завершающая ';' (точка с запятой в строках тоже отклоняется).
+    """
+    if sqlglot is None:
+        if ";" in query.strip().rstrip(";"):
+            raise MultipleStatementsError("Должен быть ровно один SQL-запрос")
+        return
+    try:
+        statements = [s for s in sqlglot.parse(query, read="postgres") if s is not None]
+    except ParseError as e:
+        raise MultipleStatementsError(f"Не удалось разобрать запрос: {e}") from e
+    if len(statements) != 1:
+        raise MultipleStatementsError("Должен быть ровно один SQL-запрос")
+
+
+def configure_readonly(cursor, timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS):
+    """
+    Первая команда транзакции: ограничение времени выполнения.
+    Только чтение задается на уровне сессии при открытии соединения (см. src/db_pool.py).
+    """
+    cursor.execute(TIMEOUT_SQL, (str(timeout_ms),))
+
+
+async def aconfigure_readonly(cursor, timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS):
+    """То же для асинхронного курсора psycopg 3."""
+    await cursor.execute(TIMEOUT_SQL, (str(timeout_ms),))
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _plan_root(plan) -> dict:
+    if isinstance(plan, str):  # Без json-адаптера драйвер вернет строку
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _seq_scans(root: dict) -> list:
+    return [node.get("Relation Name") for node in _walk(root) if node.get("Node Type") == "Seq Scan"]
+
+
+def _summarize(root: dict, seq_scans: list, table_rows: dict) -> dict:
+    return {
+        "total_cost": float(root.get("Total Cost", 0)),
+        "plan_rows": float(root.get("Plan Rows", 0)),
+        "seq_scans": [{"table": t, "table_rows": table_rows.get(t, 0.0)} for t in seq_scans],
+    }
+
+
+def explain(cursor, query: str) -> dict:
+    """
+    Выполняет EXPLAIN (FORMAT JSON) и возвращает сводку плана:
+    оценочную стоимость, число строк и список Seq Scan с размером таблиц.
+    """
+    ensure_single_statement(query)
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {query}")
+    root = _plan_root(cursor.fetchone()[0])
+
+    seq_scans = _seq_scans(root)
+    table_rows = {}
+    if seq_scans:
+        cursor.execute(TABLE_ROWS_SQL, (list(set(seq_scans)),))
+        table_rows = {name: float(rows) for name, rows in cursor.fetchall()}
+    return _summarize(root, seq_scans, table_rows)
+
+
+async def aexplain(cursor, query: str) -> dict:
+    """Асинхронный вариант explain (курсор psycopg 3)."""
+    ensure_single_statement(query)
+    await cursor.execute(f"EXPLAIN (FORMAT JSON) {query}")
+    root = _plan_root((await cursor.fetchone())[0])
+
+    seq_scans = _seq_scans(root)
+    table_rows = {}
+    if seq_scans:
+        await cursor.execute(TABLE_ROWS_SQL, (list(set(seq_scans)),))
+        table_rows = {name: float(rows) for name, rows in await cursor.fetchall()}
+    return _summarize(root, seq_scans, table_rows)
+
+
+def check_plan(summary: dict) -> list:
+    """Список нарушений порогов (пустой — план допустим)."""
+    problems = []
+    if summary["total_cost"] > SQL_MAX_PLAN_COST:
+        problems.append(f"оценочная стоимость {summary['total_cost']:.0f} > {SQL_MAX_PLAN_COST:.0f}")
+    if summary["plan_rows"] > SQL_MAX_PLAN_ROWS:
+        problems.append(f"ожидается {summary['plan_rows']:.0f} строк > {SQL_MAX_PLAN_ROWS:.0f}")
+    for scan in summary["seq_scans"]:
+        if scan["table_rows"] > SQL_SEQSCAN_MAX_TABLE_ROWS:
+            problems.append(
+                f"полный проход (Seq Scan) по большой таблице {scan['table']} (~{scan['table_rows']:.0f} строк)"
+            )
+    return problems
+
+
+def format_plan_feedback(summary: dict, problems: list) -> str:
+    seq = ", ".join(s["table"] for s in summary["seq_scans"]) or "нет"
+    text = (f"План запроса: стоимость={summary['total_cost']:.0f}, строк≈{summary['plan_rows']:.0f}, "
+            f"Seq Scan: {seq}.")
+    if problems:
+        text += " Превышены пороги: " + "; ".join(problems) + \
+                ". Перепиши запрос: добавь фильтры по индексированным колонкам, LIMIT или агрегацию."
+    return text
+
+
+def inspect_query(query: str):
+    """EXPLAIN запроса в отдельной read-only транзакции. Возвращает (сводка, нарушения)."""
+    ensure_single_statement(query)  # До того, как брать соединение из пула
+    with get_pg_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            configure_readonly(cursor)
+            summary = explain(cursor, query)
+    return summary, check_plan(summary)
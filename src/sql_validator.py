@@ -0,0 +1,111 @@
+"""
+Локальная детерминированная проверка SQL вместо похода в LLM-валидатор.
+
+Запрос разбирается в AST (диалект PostgreSQL, sqlglot), проверяется, что это
+ровно один читающий запрос, а таблицы и колонки сверяются с закэшированной схемой.
+Результат — {"status": "ok" | "error" | "unknown", "errors": [...]}:
+"unknown" означает, что локально решить нельзя (нет sqlglot, системные схемы,
+табличные функции и т.п.) и запрос нужно отдать LLM-инспектору.
+"""
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ParseError
+except ImportError:  # sqlglot — необязательная зависимость
+    sqlglot = None
+
+if sqlglot is not None:
+    # Узлы, которые меняют данные или схему — запрещены в любом месте запроса (в т.ч. в CTE)
+    # (getattr — набор классов немного отличается между версиями sqlglot)
+    WRITE_NODES = tuple(
+        getattr(exp, name) for name in (
+            "Insert", "Update", "Delete", "Merge", "Create", "Drop", "Alter",
+            "TruncateTable", "Command", "Into", "Grant", "Copy",
+        ) if hasattr(exp, name)
+    )
+
+
+def _result(status: str, errors: list = None) -> dict:
+    return {"status": status, "errors": errors or []}
+
+
+def validate_sql(query: str, tables: dict) -> dict:
+    """tables — структурированная схема {таблица: [(колонка, тип), ...]} (см. SchemaCache.get_tables)."""
+    if sqlglot is None:
+        return _result("unknown", ["sqlglot не установлен"])
+
+    try:
+        statements = [s for s in sqlglot.parse(query, read="postgres") if s is not None]
+    except ParseError as e:
+        detail = e.errors[0].get("description", str(e)) if e.errors else str(e)
+        return _result("error", [f"Синтаксическая ошибка: {detail}"])
+
+    if len(statements) != 1:
+        return _result("error", ["Должен быть ровно один SQL-запрос"])
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        return _result("error", ["Разрешены только запросы SELECT"])
+    for node in tree.walk():
+        if isinstance(node, WRITE_NODES):
+            return _result("error", [f"Запрещенная операция: {node.key.upper()}"])
+
+    known = {table.lower(): {column.lower() for column, _ in columns} for table, columns in tables.items()}
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    errors, undecided = [], False
+
+    # Псевдоним (или имя) источника -> таблица схемы; None — CTE или подзапрос с неизвестными колонками
+    sources = {}
+    for table in tree.find_all(exp.Table):
+        name, schema = table.name.lower(), table.db.lower()
+        alias = (table.alias or table.name).lower()
+        if not name or (schema and schema != "public"):
+            undecided = True  # Табличная функция или системная/чужая схема
+            sources[alias] = None
+            continue
+        if name in cte_names and not schema:
+            sources[alias] = None
+            continue
+        if name not in known:
+            errors.append(f"Таблица {table.name} не найдена в схеме базы данных")
+            continue
+        sources[alias] = name
+    for subquery in tree.find_all(exp.Subquery):
+        if subquery.alias:
+            sources[subquery.alias.lower()] = None
+    # VALUES, unnest(), LATERAL и прочие табличные выражения: колонки известны только Postgres,
+    # поэтому псевдоним и список колонок v(x) регистрируем как непрозрачный источник и отдаем LLM
+    opaque_columns = set()
+    for table_alias in tree.find_all(exp.TableAlias):
+        if isinstance(table_alias.parent, (exp.Table, exp.CTE, exp.Subquery)) or not table_alias.name:
+            continue
+        undecided = True
+        sources[table_alias.name.lower()] = None
+        # unnest(arr) AS elem без списка колонок: имя псевдонима одновременно и имя колонки
+        opaque_columns.add(table_alias.name.lower())
+        opaque_columns.update(column.name.lower() for column in table_alias.columns)
+
+    output_aliases = {alias.alias.lower() for alias in tree.find_all(exp.Alias)}
+    schema_tables = {t for t in sources.values() if t}
+    has_opaque_sources = any(t is None for t in sources.values())
+
+    for column in tree.find_all(exp.Column):
+        if isinstance(column.this, exp.Star):
+            continue
+        name, qualifier = column.name.lower(), column.table.lower()
+        if qualifier:
+            if qualifier not in sources:
+                if qualifier not in known:
+                    errors.append(f"Неизвестная таблица или псевдоним {column.table} в {column.sql()}")
+                continue
+            target = sources[qualifier]
+            if target and name not in known[target]:
+                errors.append(f"Колонка {column.name} отсутствует в таблице {target}")
+        elif name not in output_aliases and not any(name in known[t] for t in schema_tables):
+            if has_opaque_sources or name in opaque_columns:
+                undecided = True  # Колонка может приходить из CTE или подзапроса
+            else:
+                errors.append(f"Колонка {column.name} не найдена ни в одной из таблиц запроса")
+
+    if errors:
+        return _result("error", errors)
+    return _result("unknown" if undecided else "ok")
@@ -0,0 +1,94 @@
+"""
+Потоковая выдача ответа агента (Server-Sent Events) поверх app.astream_events.
+
+События (поле event: в SSE, данные — JSON):
+- session      — сразу после запроса: session_id (первый байт уходит до любой работы графа);
+- node_start   — узел графа начал работу (agent, inspection, cost_gate, tools, ...);
+- token        — очередной фрагмент текста ответа агента;
+- verdict      — итог инспекции/проверки плана: status (ok | advice | rejected) и feedback;
+- sql_ready    — агент сформировал SQL (дальше он идет на инспекцию и подтверждение);
+- tool_end     — инструмент отработал (для execute_sql — строки результата);
+- node_end     — узел графа завершил работу;
+- done         — финальный ответ (как в POST /chat) и состояние треда;
+- error        — граф упал; поток после этого закрывается.
+У каждого события есть elapsed_ms — время от начала запроса.
+"""
+import json
+import os
+import time
+
+from src.history import SUMMARY_TAG
+from src.llm_router import ROUTER_CANDIDATE_TAG
+
+# Сколько символов вывода инструмента отдавать в событии tool_end
+STREAM_TOOL_OUTPUT_CHARS = int(os.getenv("STREAM_TOOL_OUTPUT_CHARS", "2000"))
+# Узел, чьи токены транслируются пользователю (инспекторы и резюме истории — внутренние вызовы)
+STREAM_TOKEN_NODE = "agent"
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _node_details(node: str, output) -> list:
+    """Доп. события по результату узла: [(event, data)]."""
+    if not isinstance(output, dict):
+        return []
+    if node in ("inspection", "cost_gate") and output.get("inspection_status"):
+        # Статус выставляет сам узел: рекомендация оптимизатора — не отказ
+        return [("verdict", {"node": node, "status": output["inspection_status"],
+                             "feedback": output.get("feedback")})]
+    if node in ("agent", "semantic_cache") and output.get("awaiting_confirmation") and output.get("generated_sql"):
+        return [("sql_ready", {"node": node, "sql": output["generated_sql"]})]
+    return []
+
+
+async def stream_chat(graph, inputs: dict, config: dict):
+    """Асинхронный генератор SSE-строк для одного сообщения пользователя."""
+    started = time.perf_counter()
+    thread_id = config["configurable"]["thread_id"]
+    nodes = set(graph.nodes) - {"__start__"}
+
+    def emit(event: str, data: dict) -> str:
+        return sse_event(event, {**data, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    yield emit("session", {"session_id": thread_id})
+    try:
+        async for event in graph.astream_events(inputs, config=config, version="v2"):
+            kind, name = event["event"], event["name"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chat_model_stream":
+                tags = event.get("tags", [])
+                # Токены кандидатов роутера (в т.ч. проигравшего хеджа) повторяют токены самого роутера
+                if node != STREAM_TOKEN_NODE or SUMMARY_TAG in tags or ROUTER_CANDIDATE_TAG in tags:
+                    continue
+                text = event["data"]["chunk"].content
+                if text:
+                    yield emit("token", {"text": text})
+            elif kind == "on_chain_start" and name in nodes and name == node:
+                yield emit("node_start", {"node": name})
+            elif kind == "on_chain_end" and name in nodes and name == node:
+                for detail, data in _node_details(name, event["data"].get("output")):
+                    yield emit(detail, data)
+                yield emit("node_end", {"node": name})
+            elif kind == "on_tool_end":
+                output = event["data"].get("output")
+                content = str(getattr(output, "content", output))
+                yield emit("tool_end", {
+                    "tool": name,
+                    "output": content[:STREAM_TOOL_OUTPUT_CHARS],
+                    "truncated": len(content) > STREAM_TOOL_OUTPUT_CHARS,
+                })
+
+        state = (await graph.aget_state(config)).values
+        last_message = state["messages"][-1]
+        yield emit("done", {
+            "reply": last_message.content if last_message.content else "Инструменты выполнены",
+            "session_id": thread_id,
+            "generated_sql": state.get("generated_sql"),
+            "awaiting_confirmation": state.get("awaiting_confirmation", False),
+        })
+    except Exception as e:
+        print(f"📡 [STREAM]: ошибка в треде {thread_id}: {e}")
+        yield emit("error", {"message": f"Ошибка при обработке запроса: {e}"})
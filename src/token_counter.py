@@ -0,0 +1,18 @@
+# Подсчет токенов локально, без обращения к API.
+# tiktoken — необязательная зависимость: без него используется оценка по длине текста.
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# Для смеси кириллицы, цифр и SQL в среднем ~3 символа на токен
+CHARS_PER_TOKEN = 3
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // CHARS_PER_TOKEN + 1
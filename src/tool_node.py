@@ -1,41 +1,172 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
 from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+# Таймаут одного вызова инструмента по умолчанию (секунды) и число потоков для синхронных вызовов
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "60"))
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+# Сколько ждать свободный поток пула, прежде чем отказать (время в очереди не входит в таймаут вызова)
+TOOL_QUEUE_TIMEOUT = float(os.getenv("TOOL_QUEUE_TIMEOUT", "30"))
+# Сколько вызовов одного инструмента может продолжать работу после таймаута (поток не прервать);
+# при достижении лимита новые вызовы этого инструмента сразу получают ошибку, а не занимают пул
+TOOL_MAX_HUNG_PER_TOOL = int(os.getenv("TOOL_MAX_HUNG_PER_TOOL", "2"))
+
+# Пул копирует contextvars в поток: колбэки LangChain (Langfuse, astream_events) видят родительский run
+TOOL_POOL = ContextThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+
+
+class _PendingCall:
+    """Вызов, отправленный в пул: future и момент, когда поток действительно начал его выполнять."""
+    def __init__(self, tool_call: dict):
+        self.tool_call = tool_call
+        self.queued = time.perf_counter()
+        self.running = threading.Event()
+        self.started = None
+        self.future = None
+        self.result = None  # Готовый ответ без выполнения (вызов отклонен до отправки в пул)
 
 
 class CustomToolNode:
-    def __init__(self, tools: list):
+    """
+    Выполняет все вызовы инструментов из последнего AIMessage одновременно
+    (синхронные — в пуле потоков, асинхронные — через asyncio.gather).
+    Порядок ToolMessage совпадает с порядком tool_calls; у каждого вызова свой таймаут,
+    время выполнения пишется в ToolMessage.response_metadata["duration_ms"].
+
+    Синхронный таймаут отсчитывается с момента, когда поток начал выполнять вызов.
+    Поток, не уложившийся в таймаут, прервать нельзя: он продолжает занимать место в пуле,
+    поэтому таких "зависших" вызовов одного инструмента не больше max_hung_per_tool.
+    """
+    def __init__(self, tools: list, timeout: float = TOOL_TIMEOUT, timeouts: dict = None,
+                 queue_timeout: float = TOOL_QUEUE_TIMEOUT, max_hung_per_tool: int = TOOL_MAX_HUNG_PER_TOOL):
         # Сохраняем инструменты в словарь для быстрого доступа по имени
         self.tools_by_name = {tool.name: tool for tool in tools}
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.queue_timeout = queue_timeout
+        self.max_hung_per_tool = max_hung_per_tool
+        self._hung = {}  # имя инструмента -> число вызовов, работающих после таймаута
+        self._hung_lock = threading.Lock()
 
-    def __call__(self, state: dict):
-        """Этот метод делает класс 'вызываемым', как функцию"""
+    @staticmethod
+    def _tool_calls(state: dict) -> list:
         messages = state.get("messages", [])
         last_message = messages[-1]
-
         if not hasattr(last_message, "tool_calls") or not last_message.tool_calls:
-            return {"messages": []}
-
-        tool_outputs = []
-        for tool_call in last_message.tool_calls:
-            tool_name = tool_call["name"]
-            arguments = tool_call["args"]
-            
-            # Логика поиска и запуска
-            tool = self.tools_by_name.get(tool_name)
-            if tool:
-                try:
-                    # Здесь будет точка входа для Langfuse в будущем
-                    result = tool.invoke(arguments)
-                except Exception as e:
-                    result = f"Error in {tool_name}: {str(e)}"
-            else:
-                result = f"Tool {tool_name} not found."
-
-            tool_outputs.append(
-                ToolMessage(
-                    content=str(result),
-                    tool_call_id=tool_call["id"],
-                    name=tool_name
-                )
-            )
-        
-        return {"messages": tool_outputs}
\ No newline at end of file
+            return []
+        return last_message.tool_calls
+
+    def _timeout_for(self, tool_name: str) -> float:
+        return self.timeouts.get(tool_name, self.timeout)
+
+    @staticmethod
+    def _message(tool_call: dict, result, status: str, started: float) -> ToolMessage:
+        status_field = "success" if status == "ok" else "error"
+        return ToolMessage(
+            content=str(result),
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"],
+            status=status_field,
+            response_metadata={"duration_ms": round((time.perf_counter() - started) * 1000, 1), "status": status},
+        )
+
+    @staticmethod
+    def _log(messages: list, started: float):
+        if len(messages) > 1:
+            total = sum(m.response_metadata["duration_ms"] for m in messages)
+            wall = (time.perf_counter() - started) * 1000
+            print(f"🧰 [TOOLS]: параллельно выполнено вызовов: {len(messages)} за {wall:.0f} мс (последовательно ~{total:.0f} мс)")
+
+    def _run(self, tool_call: dict, pending: _PendingCall = None) -> ToolMessage:
+        started = time.perf_counter()
+        if pending is not None:
+            pending.started = started
+            pending.running.set()
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return self._message(tool_call, f"Tool {tool_call['name']} not found.", "error", started)
+        try:
+            return self._message(tool_call, tool.invoke(tool_call["args"]), "ok", started)
+        except Exception as e:
+            return self._message(tool_call, f"Error in {tool_call['name']}: {str(e)}", "error", started)
+
+    def _submit(self, tool_call: dict) -> _PendingCall:
+        pending = _PendingCall(tool_call)
+        name = tool_call["name"]
+        with self._hung_lock:
+            hung = self._hung.get(name, 0)
+        if hung >= self.max_hung_per_tool:
+            pending.result = self._message(
+                tool_call, f"Error in {name}: инструмент не отвечает ({hung} вызовов еще выполняются после таймаута)",
+                "error", pending.queued)
+            return pending
+        pending.future = TOOL_POOL.submit(self._run, tool_call, pending)
+        return pending
+
+    def _abandon(self, name: str, future):
+        """Вызов превысил таймаут, но его поток еще работает: учитываем его до завершения."""
+        with self._hung_lock:
+            self._hung[name] = self._hung.get(name, 0) + 1
+
+        def release(_):
+            with self._hung_lock:
+                self._hung[name] -= 1
+
+        future.add_done_callback(release)
+
+    def _wait(self, pending: _PendingCall) -> ToolMessage:
+        if pending.result is not None:
+            return pending.result
+        call, name = pending.tool_call, pending.tool_call["name"]
+        # Пока вызов стоит в очереди пула, его таймаут не идет; отменить можно только не начатый вызов
+        if not pending.running.wait(self.queue_timeout) and pending.future.cancel():
+            return self._message(call, f"Error in {name}: нет свободного потока за {self.queue_timeout:g} с",
+                                 "timeout", pending.queued)
+        pending.running.wait()
+        timeout = self._timeout_for(name)
+        remaining = timeout - (time.perf_counter() - pending.started)
+        try:
+            return pending.future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            # Поток не прервать: результат просто не ждем (SQL ограничен statement_timeout)
+            self._abandon(name, pending.future)
+            return self._message(call, f"Error in {name}: превышен таймаут {timeout:g} с", "timeout", pending.started)
+
+    def __call__(self, state: dict):
+        """Этот метод делает класс 'вызываемым', как функцию"""
+        started = time.perf_counter()
+        # Даже одиночный вызов идет через пул, чтобы на него действовал таймаут
+        pending = [self._submit(call) for call in self._tool_calls(state)]
+        tool_outputs = [self._wait(p) for p in pending]
+
+        self._log(tool_outputs, started)
+        return {"messages": tool_outputs}
+
+    async def _arun(self, tool_call: dict) -> ToolMessage:
+        started = time.perf_counter()
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return self._message(tool_call, f"Tool {tool_call['name']} not found.", "error", started)
+        timeout = self._timeout_for(tool_call["name"])
+        try:
+            result = await asyncio.wait_for(tool.ainvoke(tool_call["args"]), timeout=timeout)
+            return self._message(tool_call, result, "ok", started)
+        except asyncio.TimeoutError:
+            return self._message(tool_call, f"Error in {tool_call['name']}: превышен таймаут {timeout:g} с",
+                                 "timeout", started)
+        except Exception as e:
+            return self._message(tool_call, f"Error in {tool_call['name']}: {str(e)}", "error", started)
+
+    async def acall(self, state: dict):
+        """Асинхронный вариант для app.ainvoke: инструменты с корутиной не блокируют event loop,
+        синхронные LangChain сам выполняет в пуле потоков."""
+        started = time.perf_counter()
+        # gather сохраняет порядок результатов
+        tool_outputs = list(await asyncio.gather(*(self._arun(call) for call in self._tool_calls(state))))
+        self._log(tool_outputs, started)
+        return {"messages": tool_outputs}
@@ -4,18 +4,43 @@ from src.tool_node import CustomToolNode
 
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from src.db_pool import get_pg_connection, get_pg_pool  # Соединения берем из общего пула
+from src.async_db import get_async_pg_pool, dict_row  # Асинхронный пул (psycopg 3) для app.ainvoke
+from src.schema_cache import schema_cache
+from src.schema_index import schema_index, SCHEMA_INDEX_MIN_TABLES
+from src.result_store import result_store, make_page
+from src.result_cache import query_cache, store_query_result
+from src.result_encoder import encode_rows
+from src.sql_guard import configure_readonly, explain, check_plan, format_plan_feedback, aconfigure_readonly, aexplain, ensure_single_statement, MultipleStatementsError, SQL_STATEMENT_TIMEOUT_MS
 import os
-
-def get_pg_connection():
-    return psycopg2.connect(
-        dbname=os.getenv("DB_NAME", "postgres"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "postgres"),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "5432")
-    )
+import uuid
 
 DB_PATH = "init_db.sql"
+# Максимум строк, который execute_sql вычитывает из базы за один запрос
+SQL_ROW_CAP = int(os.getenv("SQL_ROW_CAP", "10000"))
+# Сколько строк за раз тянет серверный курсор (один FETCH на пачку)
+SQL_FETCH_BATCH = int(os.getenv("SQL_FETCH_BATCH", "1000"))
+
+
+def fetch_capped(cursor, limit: int = SQL_ROW_CAP + 1) -> list:
+    """Читает из серверного курсора пачками по SQL_FETCH_BATCH, но не больше limit строк."""
+    rows = []
+    while len(rows) < limit:
+        batch = cursor.fetchmany(min(SQL_FETCH_BATCH, limit - len(rows)))
+        if not batch:
+            break
+        rows.extend(batch)
+    return rows
+
+
+async def afetch_capped(cursor, limit: int = SQL_ROW_CAP + 1) -> list:
+    rows = []
+    while len(rows) < limit:
+        batch = await cursor.fetchmany(min(SQL_FETCH_BATCH, limit - len(rows)))
+        if not batch:
+            break
+        rows.extend(batch)
+    return rows
 
 @tool
 def user_confirmation(query: str) -> bool:
@@ -33,75 +58,174 @@ def get_db_schema():
     Используй этот инструмент перед написанием SQL-запроса.
     """
     try:
-        conn = get_pg_connection()
-        cursor = conn.cursor()
-        
-        # SQL для получения всех таблиц и их колонок в схеме 'public'
-        query = """
-        SELECT table_name, column_name, data_type
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-        ORDER BY table_name, ordinal_position;
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        
-        if not rows:
+        # Схема кэшируется и перечитывается только при изменении отпечатка каталога
+        return schema_cache.get_text()
+    except Exception as e:
+        return f"Ошибка при получении схемы: {str(e)}"
+
+
+@tool
+def get_relevant_schema(question: str):
+    """
+    Возвращает только таблицы, относящиеся к вопросу пользователя (с комментариями
+    и внешними ключами), плюс связанные с ними таблицы для JOIN.
+    Используй вместо get_db_schema, когда в базе много таблиц.
+    """
+    try:
+        # Маленькую схему отдаем целиком: отбор ничего не сэкономит
+        if len(schema_cache.get_tables()) <= SCHEMA_INDEX_MIN_TABLES:
+            return schema_cache.get_text()
+        result = schema_index.search(question)
+        if not result["tables"]:
             return "База данных пуста или таблицы находятся не в схеме 'public'."
+        header = (f"Показаны {len(result['tables']) + len(result['neighbours'])} из {result['total_tables']} таблиц, "
+                  f"наиболее близких к вопросу (и связанные с ними). Если нужной таблицы нет — уточни вопрос.")
+        return f"{header}\n\n{result['text']}"
+    except Exception as e:
+        return f"Ошибка при получении схемы: {str(e)}"
 
-        schema_dict = {}
-        for table, column, dtype in rows:
-            if table not in schema_dict:
-                schema_dict[table] = []
-            schema_dict[table].append(f"{column} ({dtype})")
-        
-        schema_info = []
-        for table, columns in schema_dict.items():
-            schema_info.append(f"Таблица: {table}\nКолонки: {', '.join(columns)} ")
-        
-        cursor.close()
-        conn.close()
-        return "\n\n".join(schema_info)
+
+async def aget_db_schema():
+    """Асинхронная реализация get_db_schema (используется при app.ainvoke)."""
+    try:
+        return await schema_cache.aget_text()
     except Exception as e:
         return f"Ошибка при получении схемы: {str(e)}"
 
+
+def encode_page(page: dict, all_rows: list = None) -> str:
+    """Страница результата в компактном виде + подсказка, как получить следующую."""
+    footer = f"Страница {page['page']} из {page['total_pages']}, handle={page['handle']}"
+    if page["truncated"]:
+        footer += f" (результат обрезан до {page['rows_total']} строк)"
+    return encode_rows(page["rows"], total_rows=page["rows_total"], stats_rows=all_rows, footer=footer)
+
+
+def clean_sql(query: str) -> str:
+    """Очистка запроса от лишних символов (Markdown и т.д.)"""
+    return query.strip().replace("```sql", "").replace("```", "").strip()
+
+
+def render_sql_result(clean_query: str, rows: list, truncated: bool) -> str:
+    if not rows:
+        return "Запрос выполнен успешно, но данных не найдено."
+
+    # Результат уходит в LLM компактным CSV в пределах бюджета токенов
+    if len(rows) <= result_store.page_size and not truncated:
+        return encode_rows(rows)
+
+    # Результат не помещается на одну страницу: сохраняем и отдаем первую страницу с handle
+    handle = result_store.put(clean_query, rows, truncated)
+    return encode_page(make_page(rows, 1, result_store.page_size, handle, truncated), rows)
+
+
 @tool
 def execute_sql(query: str):
     """
     Выполняет SQL-запрос к PostgreSQL и возвращает результат.
     Принимает только SELECT запросы.
+    Большой результат возвращается постранично: первая страница и handle,
+    остальные страницы можно получить через fetch_sql_page.
     """
     try:
-        conn = get_pg_connection()
-        # RealDictCursor автоматически делает zip(names, row) за нас
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Очистка запроса от лишних символов (Markdown и т.д.)
-        clean_query = query.strip().replace("```sql", "").replace("```", "").strip()
+        clean_query = clean_sql(query)
         
         if not clean_query.lower().startswith("select"):
             return "Ошибка: Разрешены только запросы SELECT."
-            
-        cursor.execute(clean_query)
-        rows = cursor.fetchall()
-        
-        # Сохраняем результат в RAG кэш
-        if rows and clean_query.strip().upper().startswith('SELECT'):
-            result_text = str(rows)[:200]  # Ограничиваем размер
-            store_query_result(f"SQL запрос", clean_query, result_text)
-        
-        cursor.close()
-        conn.close()
-        
-        if not rows:
-            return "Запрос выполнен успешно, но данных не найдено."
-            
-        return rows # Возвращает список словарей [{col: val}, ...]
+        # Несколько операторов в одной строке драйвер выполнил бы все подряд
+        try:
+            ensure_single_statement(clean_query)
+        except MultipleStatementsError as e:
+            return f"Ошибка: {e}"
+
+        # Повторный запрос (с точностью до пробелов/регистра) отдаем из кэша без похода в базу
+        cached = query_cache.get(clean_query)
+        if cached is not None:
+            rows, truncated = cached
+        else:
+            with get_pg_pool().connection() as conn:
+                # Транзакция только на чтение с statement_timeout; дорогой план
+                # отклоняем по EXPLAIN до выполнения
+                with conn.cursor() as guard:
+                    configure_readonly(guard)
+                    summary = explain(guard, clean_query)
+                    problems = check_plan(summary)
+                if problems:
+                    return f"Ошибка: запрос отклонен по плану выполнения. {format_plan_feedback(summary, problems)}"
+                # Именованный (серверный) курсор: строки идут из базы пачками по SQL_FETCH_BATCH
+                # (отдельный FETCH на пачку), и мы читаем не больше SQL_ROW_CAP + 1
+                # (лишняя строка — признак обрезки).
+                # RealDictCursor автоматически делает zip(names, row) за нас
+                with conn.cursor(name=f"agent_{uuid.uuid4().hex[:8]}", cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(clean_query)
+                    rows = [dict(row) for row in fetch_capped(cursor)]
+            truncated = len(rows) > SQL_ROW_CAP
+            rows = rows[:SQL_ROW_CAP]
+            store_query_result(clean_query, rows, truncated)
+
+        return render_sql_result(clean_query, rows, truncated)
         
     except Exception as e:
         return f"Ошибка SQL PostgreSQL: {str(e)}"
 
 
+async def aexecute_sql(query: str):
+    """Асинхронная реализация execute_sql: те же проверки, но через пул psycopg 3."""
+    try:
+        clean_query = clean_sql(query)
+
+        if not clean_query.lower().startswith("select"):
+            return "Ошибка: Разрешены только запросы SELECT."
+        # Несколько операторов в одной строке драйвер выполнил бы все подряд
+        try:
+            ensure_single_statement(clean_query)
+        except MultipleStatementsError as e:
+            return f"Ошибка: {e}"
+
+        cached = query_cache.get(clean_query)
+        if cached is not None:
+            rows, truncated = cached
+        else:
+            pool = await get_async_pg_pool()
+            async with pool.connection() as conn:
+                async with conn.cursor() as guard:
+                    await aconfigure_readonly(guard)
+                    summary = await aexplain(guard, clean_query)
+                    problems = check_plan(summary)
+                if problems:
+                    return f"Ошибка: запрос отклонен по плану выполнения. {format_plan_feedback(summary, problems)}"
+                async with conn.cursor(name=f"agent_{uuid.uuid4().hex[:8]}", row_factory=dict_row) as cursor:
+                    await cursor.execute(clean_query)
+                    rows = await afetch_capped(cursor)
+            truncated = len(rows) > SQL_ROW_CAP
+            rows = rows[:SQL_ROW_CAP]
+            store_query_result(clean_query, rows, truncated)
+
+        return render_sql_result(clean_query, rows, truncated)
+
+    except Exception as e:
+        return f"Ошибка SQL PostgreSQL: {str(e)}"
+
+
+# Асинхронные реализации: tool.ainvoke (app.ainvoke в FastAPI) вызывает корутину,
+# tool.invoke (CLI) — синхронную функцию на psycopg2
+get_db_schema.coroutine = aget_db_schema
+execute_sql.coroutine = aexecute_sql
+
+
+@tool
+def fetch_sql_page(handle: str, page: int):
+    """
+    Возвращает страницу page (с 1) большого результата execute_sql по его handle.
+    Используй, только если для ответа действительно нужны строки за пределами первой страницы.
+    """
+    result = result_store.page(handle, page, include_all_rows=True)
+    if result is None:
+        return "Ошибка: результат не найден или устарел. Выполните запрос заново."
+    # Статистика колонок — по всему результату, как и на первой странице
+    return encode_page(result, result.pop("all_rows"))
+
+
 @tool
 def search_company_knowledge(query: str):
     """
@@ -110,8 +234,8 @@ def search_company_knowledge(query: str):
     Используй это, если вопрос НЕ касается конкретных цифр из базы данных.
     """
     try:
-        from src.vector_store import vector_db
-        results = vector_db.search(query)
+        from src.vector_store import get_vector_db
+        results = get_vector_db().search(query)
         if not results:
             return "В базе знаний документов по этому вопросу не найдено."
         
@@ -121,6 +245,9 @@ def search_company_knowledge(query: str):
         return f"Ошибка векторного поиска: {e}"
 
 
-tools_list = [get_db_schema, execute_sql, user_confirmation, search_company_knowledge]
+tools_list = [get_db_schema, get_relevant_schema, execute_sql, fetch_sql_page, user_confirmation, search_company_knowledge]
+
+# Для execute_sql таймаут — statement_timeout плюс ожидание соединения из пула
+SQL_TOOL_TIMEOUT = SQL_STATEMENT_TIMEOUT_MS / 1000 + float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
 
-tool_node = CustomToolNode(tools=tools_list)
+tool_node = CustomToolNode(tools=tools_list, timeouts={"execute_sql": SQL_TOOL_TIMEOUT})
@@ -1,20 +1,113 @@
-from qdrant_client import QdrantClient
 from langchain_huggingface import HuggingFaceEmbeddings
-from qdrant_client.models import VectorParams, Distance, PointStruct, NearestQuery
+from src.embedding_cache import CachedEmbeddings
+from src.embedding_batcher import BatchingEmbeddings
+from src.lexical_index import BM25Index, tokenize, reciprocal_rank_fusion
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import os
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+import uuid
+
+# qdrant_client не нужен для mmap-бэкенда (air-gapped установки без Qdrant)
+try:
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import (
+        VectorParams, Distance, PointStruct, HnswConfigDiff, SearchParams,
+        Filter, FieldCondition, MatchValue, MatchAny, PointIdsList,
+    )
+except ImportError:
+    QdrantClient = None
+
+# Параметры хранилища и поиска (можно переопределить через .env)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")  # "qdrant" или "mmap" (см. src/mmap_store.py)
+VECTOR_SIZE = 384
+QDRANT_PATH = os.getenv("QDRANT_PATH", "./qdrant_data")
+QDRANT_URL = os.getenv("QDRANT_URL")  # Если задан — работаем с сервером Qdrant, а не с локальной папкой
+HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+HNSW_EF_SEARCH = int(os.getenv("QDRANT_HNSW_EF", "128"))
+SCORE_THRESHOLD = float(os.getenv("RAG_SCORE_THRESHOLD", "0.3"))
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "256"))
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH")  # Например ./embeddings_cache.sqlite; пусто — только память
+# Микробатчинг конкурентных embed_query (1 — выключен)
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+# Гибридный поиск: "hybrid" (BM25 + векторы), "vector" или "lexical"
+SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "hybrid")
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+VECTOR_WEIGHT = float(os.getenv("RAG_VECTOR_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.getenv("RAG_LEXICAL_WEIGHT", "1.0"))
+# Порог релевантности лексических совпадений (аналог RAG_SCORE_THRESHOLD для BM25): документ
+# должен покрывать не меньше этой доли IDF-веса запроса; термины, которые встречаются в большей
+# доле документов, чем RAG_LEXICAL_MAX_DF, считаются стоп-словами
+LEXICAL_MIN_COVERAGE = float(os.getenv("RAG_LEXICAL_MIN_COVERAGE", "0.5"))
+LEXICAL_MAX_DF = float(os.getenv("RAG_LEXICAL_MAX_DF", "0.5"))
+# Запросы не длиннее N токенов с лексическими совпадениями отвечаются без модели (0 — выключено)
+LEXICAL_SHORTCUT_TOKENS = int(os.getenv("RAG_LEXICAL_SHORTCUT_TOKENS", "0"))
+
+
+# Пространство имен для uuid5: ID точки детерминированно зависит от источника и содержимого
+POINT_ID_NAMESPACE = uuid.UUID("6f1c8f2e-3b0a-5d7e-9a41-0c2b7e5d9f13")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def make_point_id(text: str, source: str = None) -> str:
+    """Полноразмерный стабильный ID (UUID) из хэша содержимого и источника документа."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source or ''}\x00{content_hash(text)}"))
+
+
+def build_filter(filters: dict = None):
+    """Превращает словарь {поле: значение} в фильтр Qdrant по payload.
+    Список в значении означает "любое из" (MatchAny)."""
+    if not filters:
+        return None
+    conditions = []
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            conditions.append(FieldCondition(key=key, match=MatchAny(any=list(value))))
+        else:
+            conditions.append(FieldCondition(key=key, match=MatchValue(value=value)))
+    return Filter(must=conditions)
+
 
 class VectorManager:
     def __init__(self):
-        # Модель для векторизации (384 измерения)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        # Модель для векторизации (384 измерения), обернутая в кэш:
+        # повторные вопросы и повторная загрузка тех же текстов не гоняют модель заново
+        # Промахи кэша от одновременных поисков считаются общим батчем
+        model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        if EMBED_BATCH_MAX > 1:
+            model = BatchingEmbeddings(model, max_batch=EMBED_BATCH_MAX, max_wait_ms=EMBED_BATCH_WAIT_MS)
+        self.embeddings = CachedEmbeddings(
+            model,
+            model_name=EMBEDDING_MODEL,
+            max_size=EMBED_CACHE_SIZE,
+            persist_path=EMBED_CACHE_PATH
         )
-        # Храним данные локально в папке проекта
-        self.qdrant = QdrantClient(path="./qdrant_data")
         self.collection_name = "company_docs"
+        self._init_store()
+        # Лексический индекс строится из payload-ов коллекции при первом гибридном поиске
+        self.lexical = BM25Index()
+        self._lexical_loaded = False
+        self._lexical_lock = threading.Lock()
+
+    # --- Хранилище векторов ---
+    # Методы ниже — точка расширения для других бэкендов (см. MmapVectorManager):
+    # _init_store, _iter_payloads, _vector_search_by_vector, _upsert, _delete.
+
+    def _init_store(self):
+        if QdrantClient is None:
+            raise RuntimeError("qdrant-client не установлен. Установите его или используйте VECTOR_BACKEND=mmap")
+        # Храним данные локально в папке проекта (или на сервере, если задан QDRANT_URL)
+        if QDRANT_URL:
+            self.qdrant = QdrantClient(url=QDRANT_URL, api_key=os.getenv("QDRANT_API_KEY"))
+        else:
+            self.qdrant = QdrantClient(path=QDRANT_PATH)
         self._init_collection()
 
     def _init_collection(self):
@@ -24,44 +117,188 @@ class VectorManager:
             if not exists:
                 self.qdrant.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=384, distance=Distance.COSINE)
+                    vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+                    hnsw_config=HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT)
                 )
         except Exception as e:
             print(f"Ошибка инициализации Qdrant: {e}")
 
-    def search(self, query: str, limit: int = 3):
-        vector = self.embeddings.embed_query(query)
-        # Используем простой scroll для поиска всех документов
-        all_points = self.qdrant.scroll(
+    def _iter_payloads(self):
+        """Перебирает (id, payload) всех документов коллекции."""
+        offset = None
+        while True:
+            points, offset = self.qdrant.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            for point in points:
+                yield point.id, point.payload
+            if offset is None:
+                break
+
+    def _vector_search_by_vector(self, vector: list, limit: int, filters: dict = None,
+                                 score_threshold: float = None, ef: int = None):
+        """Возвращает список (id, payload) ближайших соседей."""
+        # Поиск ближайших соседей делает сам Qdrant (HNSW-индекс):
+        # порог схожести и фильтры по payload применяются на его стороне,
+        # векторы обратно не передаются.
+        response = self.qdrant.query_points(
             collection_name=self.collection_name,
-            limit=100,
+            query=vector,
+            limit=limit,
+            query_filter=build_filter(filters),
+            score_threshold=SCORE_THRESHOLD if score_threshold is None else score_threshold,
+            search_params=SearchParams(hnsw_ef=ef or HNSW_EF_SEARCH),
             with_payload=True,
-            with_vectors=True
-        )[0]
-        
-        # Считаем косинусное сходство вручную
-        if not all_points:
-            return []
-            
-        vectors = [point.vector for point in all_points]
-        similarities = cosine_similarity([vector], vectors)[0]
-        
-        # Получаем топ-k самых похожих
-        top_indices = np.argsort(similarities)[-limit:][::-1]
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.3:  # Порог схожести
-                results.append(all_points[idx].payload)
-        
-        return results
+            with_vectors=False
+        )
+        return [(point.id, point.payload) for point in response.points]
 
-    def add_doc(self, text: str, metadata: dict = None):
-        stable_id = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
-        vector = self.embeddings.embed_query(text)
+    def _upsert(self, ids: list, vectors: list, payloads: list):
         self.qdrant.upsert(
             collection_name=self.collection_name,
-            points=[PointStruct(id=stable_id, vector=vector, payload={"text": text, **(metadata or {})})]
+            points=[PointStruct(id=i, vector=v, payload=p) for i, v, p in zip(ids, vectors, payloads)],
+            wait=True
         )
 
-# Глобальный объект для использования в инструментах
-vector_db = VectorManager()
\ No newline at end of file
+    def _delete(self, ids: list):
+        self.qdrant.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=ids),
+            wait=True
+        )
+
+    # --- Поиск и загрузка ---
+
+    def _ensure_lexical(self):
+        if self._lexical_loaded:
+            return
+        with self._lexical_lock:
+            if self._lexical_loaded:
+                return
+            for point_id, payload in self._iter_payloads():
+                self.lexical.add(point_id, payload.get("text", ""), payload)
+            self._lexical_loaded = True
+
+    def _index_lexical(self, ids: list, payloads: list):
+        # Если индекс еще не загружен, новые документы попадут в него при загрузке из Qdrant
+        if self._lexical_loaded:
+            for point_id, payload in zip(ids, payloads):
+                self.lexical.add(point_id, payload.get("text", ""), payload)
+
+    def _vector_search(self, query: str, limit: int, filters: dict = None,
+                       score_threshold: float = None, ef: int = None):
+        vector = self.embeddings.embed_query(query)
+        return self._vector_search_by_vector(vector, limit, filters, score_threshold, ef)
+
+    def search(self, query: str, limit: int = 3, filters: dict = None,
+               score_threshold: float = None, ef: int = None, mode: str = None):
+        mode = mode or SEARCH_MODE
+        if mode == "vector":
+            return [payload for _, payload in self._vector_search(query, limit, filters, score_threshold, ef)]
+
+        self._ensure_lexical()
+        # Берем кандидатов с запасом, чтобы слиянию было из чего выбирать; совпадения только
+        # по стоп-словам или по малой части запроса отсекаются, как векторные — по score_threshold
+        lexical_hits = self.lexical.search(query, limit=limit * 4, filters=filters,
+                                           min_coverage=LEXICAL_MIN_COVERAGE, max_df=LEXICAL_MAX_DF)
+        if mode == "lexical" or (
+            lexical_hits and len(tokenize(query)) <= LEXICAL_SHORTCUT_TOKENS
+        ):
+            # Короткий запрос по ключевым словам: модель эмбеддингов не нужна
+            return [payload for _, _, payload in lexical_hits[:limit]]
+
+        vector_hits = self._vector_search(query, limit * 4, filters, score_threshold, ef)
+        payloads = {point_id: payload for point_id, payload in vector_hits}
+        payloads.update({doc_id: payload for doc_id, _, payload in lexical_hits})
+        fused = reciprocal_rank_fusion(
+            [[point_id for point_id, _ in vector_hits], [doc_id for doc_id, _, _ in lexical_hits]],
+            weights=[VECTOR_WEIGHT, LEXICAL_WEIGHT],
+            k=RRF_K
+        )
+        return [payloads[doc_id] for doc_id in fused[:limit]]
+
+    def add_doc(self, text: str, metadata: dict = None):
+        vector = self.embeddings.embed_query(text)
+        payload = {"text": text, **(metadata or {})}
+        point_id = make_point_id(text, payload.get("source"))
+        self._upsert([point_id], [vector], [payload])
+        self._index_lexical([point_id], [payload])
+
+    def add_docs(self, texts: list, metadatas: list = None, batch_size: int = EMBED_BATCH_SIZE,
+                 parallel: int = 1) -> int:
+        """
+        Пакетная загрузка документов: эмбеддинги считаются батчами через embed_documents,
+        точки пишутся в хранилище одним upsert на батч. parallel > 1 обрабатывает
+        несколько батчей одновременно в потоках. Возвращает число загруженных документов.
+        """
+        metadatas = metadatas or [None] * len(texts)
+        batches = [
+            (texts[i:i + batch_size], metadatas[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+
+        def upload(batch):
+            batch_texts, batch_meta = batch
+            vectors = self.embeddings.embed_documents(batch_texts)
+            payloads = [{"text": text, **(meta or {})} for text, meta in zip(batch_texts, batch_meta)]
+            ids = [make_point_id(text, payload.get("source")) for text, payload in zip(batch_texts, payloads)]
+            self._upsert(ids, vectors, payloads)
+            self._index_lexical(ids, payloads)
+            return len(ids)
+
+        if parallel <= 1:
+            return sum(upload(batch) for batch in batches)
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            # list() пробрасывает первое исключение из потоков наружу
+            return sum(list(pool.map(upload, batches)))
+
+    def delete(self, ids: list):
+        """Удаляет документы по ID из хранилища и лексического индекса."""
+        if not ids:
+            return
+        self._delete(list(ids))
+        for point_id in ids:
+            self.lexical.remove(point_id)
+
+# Глобальный объект создается лениво: загрузка модели и открытие хранилища
+# происходят при первом обращении или в warmup() на старте API, а не при импорте.
+_vector_db = None
+_vector_db_lock = threading.Lock()
+_ready = threading.Event()
+
+
+def get_vector_db() -> VectorManager:
+    global _vector_db
+    if _vector_db is None:
+        with _vector_db_lock:
+            if _vector_db is None:
+                if VECTOR_BACKEND == "mmap":
+                    from src.mmap_store import MmapVectorManager
+                    _vector_db = MmapVectorManager()
+                else:
+                    _vector_db = VectorManager()
+    return _vector_db
+
+
+def warmup():
+    """Загружает модель, прогоняет один тестовый эмбеддинг (в обход кэша) и строит BM25-индекс."""
+    db = get_vector_db()
+    db.embeddings.embeddings.embed_query("warmup")
+    if SEARCH_MODE != "vector":
+        db._ensure_lexical()
+    _ready.set()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def __getattr__(name):
+    # Совместимость со старым импортом `from src.vector_store import vector_db`
+    if name == "vector_db":
+        return get_vector_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from src.result_cache import normalize_sql
+
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", "86400"))
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "5000"))
+# Путь к SQLite-файлу, чтобы вердикты переживали перезапуск (пусто — только память)
+VERDICT_CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", "")
+# 1 — запросы, отличающиеся только значениями литералов, делят один вердикт
+VERDICT_CACHE_NORMALIZE_LITERALS = os.getenv("VERDICT_CACHE_NORMALIZE_LITERALS", "1") == "1"
+# Роли, чей вердикт зависит от значений литералов: совет оптимизатора для LIMIT 10 и LIMIT 100000
+# или для разных предикатов может отличаться (другой план), поэтому ключ — точный текст SQL
+EXACT_SQL_ROLES = frozenset({"optimizer"})
+
+_STRING_RE = re.compile(r"(?:[eE])?'(?:[^']|'')*'")
+_DOUBLE_QUOTED_RE = re.compile(r"(\"(?:[^\"]|\"\")*\")")
+_NUMBER_RE = re.compile(r"(?<![\w$.])\d+(?:\.\d+)?(?:e[+-]?\d+)?(?![\w$])")
+
+
+def normalize_literals(query: str) -> str:
+    """
+    Заменяет строковые литералы на '?s', числовые — на '?n' (идентификаторы в кавычках не трогает).
+    Вид литерала сохраняется: "WHERE id = 5" и "WHERE id = 'abc'" получают разные вердикты.
+    """
+    parts = _DOUBLE_QUOTED_RE.split(_STRING_RE.sub("?s", query))
+    return "".join(part if i % 2 else _NUMBER_RE.sub("?n", part) for i, part in enumerate(parts))
+
+
+def verdict_key(role: str, query: str, prompt: str, fingerprint: str,
+                normalize: bool = VERDICT_CACHE_NORMALIZE_LITERALS) -> str:
+    """
+    Ключ вердикта: роль инспектора + нормализованный SQL + версия промпта (хэш текста)
+    + отпечаток схемы. Правка промпта или схемы автоматически дает новые ключи.
+    Литералы заменяются на '?s'/'?n' только для ролей вне EXACT_SQL_ROLES.
+    """
+    sql = normalize_sql(query)
+    if normalize and role not in EXACT_SQL_ROLES:
+        sql = normalize_literals(sql)
+    prompt_version = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+    return hashlib.sha256(f"{role}\x00{prompt_version}\x00{fingerprint}\x00{sql}".encode()).hexdigest()
+
+
+class VerdictCache:
+    """
+    Кэш ответов LLM-инспектора (валидатор/оптимизатор).
+    LRU в памяти на max_entries записей с TTL; при persist_path записи
+    дублируются в SQLite и доступны после перезапуска и другим процессам.
+    """
+    def __init__(self, ttl: float = VERDICT_CACHE_TTL, max_entries: int = VERDICT_CACHE_MAX_ENTRIES,
+                 persist_path: str = VERDICT_CACHE_PATH):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # key -> (verdict, expires_at)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expirations": 0}
+
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, verdict: str, expires_at: float):
+        # Вызывается под self._lock
+        self._memory[key] = (verdict, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+                self.stats["expirations"] += 1
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT verdict, expires_at FROM verdicts WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row:
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, verdict: str):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, verdict, expires_at)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO verdicts (key, verdict, expires_at) VALUES (?, ?, ?)",
+                                 (key, verdict, expires_at))
+                # Заодно чистим истекшие записи на диске
+                self._db.execute("DELETE FROM verdicts WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM verdicts")
+                self._db.commit()
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            total = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._memory),
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+            }
+
+
+verdict_cache = VerdictCache()
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("sqlglot")
+
+from src.sql_validator import validate_sql
+
+TABLES = {
+    "employees": [("id", "integer"), ("name", "text"), ("tags", "text[]"),
+                  ("data", "jsonb"), ("department_id", "integer")],
+    "departments": [("id", "integer"), ("name", "text")],
+}
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT v.x FROM (VALUES (1)) AS v(x)",
+    "SELECT x FROM (VALUES (1), (2)) AS v(x)",
+    "SELECT t.x FROM employees e, unnest(e.tags) AS t(x)",
+    "SELECT elem FROM employees e, unnest(e.tags) AS elem",
+    "SELECT j.key, j.value FROM employees e CROSS JOIN LATERAL jsonb_each(e.data) j",
+    "SELECT key FROM employees e CROSS JOIN LATERAL jsonb_each(e.data) AS j(key, value)",
+    "SELECT d.name, s.cnt FROM departments d JOIN LATERAL "
+    "(SELECT count(*) AS cnt FROM employees e WHERE e.department_id = d.id) s ON true",
+])
+def test_opaque_sources_go_to_llm(query):
+    # Колонки табличных выражений локально не известны — решает LLM-валидатор, а не жесткий отказ
+    assert validate_sql(query, TABLES)["status"] == "unknown"
+
+
+def test_known_columns_ok():
+    query = "SELECT e.name, d.name FROM employees e JOIN departments d ON d.id = e.department_id"
+    assert validate_sql(query, TABLES)["status"] == "ok"
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT e.nope FROM employees e",
+    "SELECT nope FROM employees",
+    "SELECT id FROM missing_table",
+    "DELETE FROM employees",
+])
+def test_invalid_queries_rejected(query):
+    assert validate_sql(query, TABLES)["status"] == "error"
+
+
+def test_schema_columns_still_checked_next_to_lateral():
+    query = "SELECT e.nope, j.key FROM employees e CROSS JOIN LATERAL jsonb_each(e.data) j"
+    result = validate_sql(query, TABLES)
+    assert result["status"] == "error"
+    assert "nope" in result["errors"][0]